@@ -0,0 +1,142 @@
+"""
+Finds the globally best weights exactly. Every decision of play depends only on the ordering of
+w0*C + w1*D, which positive rescaling leaves alone, so the weights reduce to the angle theta of
+(cos theta, sin theta) over [0, pi/2]. The turns of each game are a step function of theta; each
+step is found by replaying the game once and locating the nearest angles where a candidate it
+popped would stop beating the ones left behind it. Candidates skipped as ruled out by earlier
+answers are ruled out at any angle that makes the same guesses, so their order does not matter.
+"""
+
+import math
+import numpy as np
+from feature_store import Rankings, candidates, load, replayRankings
+from generate_outcomes import analyze
+
+DATA_MODEL = "fasttext"
+END = math.pi / 2
+EPSILON = 1e-12
+STEP = 1e-9
+
+
+class Tracer(Rankings):
+    """
+    Rankings of one weight vector that remember every ranking handed out, so the pops made from them can be checked.
+    """
+
+    def __init__(self, features, n, theta):
+        super().__init__(features, n, np.array([[math.cos(theta), math.sin(theta)]]))
+        self.used = []
+
+    def rank(self, w, k, state, within=None, containing=0):
+        ranking = super().rank(w, k, state, within, containing)
+        self.used.append((ranking, (k, state, within, containing)))
+        return ranking
+
+
+def bracket(features, n, theta):
+    """
+    Replay game n at angle theta, returning the turns taken and the open interval of angles around
+    theta over which the replay makes exactly the same pops, and so takes the same turns.
+    """
+    tracer = Tracer(features, n, theta)
+    turns = replayRankings(tracer, 0)
+    lo, hi = 0.0, END
+
+    for ranking, key in tracer.used:
+        rows, (conductance,), (density,) = candidates(features, n, *key)
+        order = np.searchsorted(rows, ranking.rows)
+
+        for j in ranking.taken:
+            # Where the popped subset and each one behind it score the same.
+            roots = np.arctan2(
+                conductance[order[j + 1:]] - conductance[order[j]], density[order[j]] - density[order[j + 1:]]
+            ) % math.pi
+            lo = max(lo, roots[roots < theta].max(initial=0.0))
+            hi = min(hi, roots[roots > theta].min(initial=END))
+
+    return turns, lo, hi
+
+
+def sweep(features, n):
+    """
+    Calculate the turns of game n as a step function of the angle. Returns the angles where the
+    turns change, starting at 0 and ending at pi/2, and the turns on each interval between them,
+    along with the number of replays it took. Steps narrower than EPSILON are not resolved.
+    """
+    edges = [0.0]
+    turns = []
+    replays = 0
+    target = END
+
+    while edges[-1] < END:
+        theta = edges[-1] + min(STEP, (target - edges[-1]) / 2)
+        taken, lo, hi = bracket(features, n, theta)
+        replays += 1
+
+        # Probing just past the last edge lands in the next step unless it is narrower than STEP,
+        # in which case it lies between the two; look closer to the edge. The same
+        # angle found through different subsets can differ in the last bits, hence the slack.
+        if lo > edges[-1] + EPSILON:
+            target = lo
+            continue
+
+        if turns and turns[-1] == taken:
+            edges[-1] = hi
+        else:
+            turns.append(taken)
+            edges.append(hi)
+
+        target = END
+
+    return np.array(edges), np.array(turns), replays
+
+
+def sweep_all(word_data, games=None):
+    """
+    Sweep every game, returning the edges of the elementary intervals of the angle, the
+    (n_intervals, n_games) turns on each of them and the total number of replays.
+    """
+    features = load(word_data)
+
+    if features["density4"].shape[1] != 1:
+        raise ValueError("the angle sweep covers the two weights of a single model, not an ensemble")
+
+    if games is None:
+        games = range(len(features["density4"]))
+
+    steps = []
+    replays = 0
+
+    for n in games:
+        edges, turns, count = sweep(features, n)
+        steps.append((edges, turns))
+        replays += count
+
+    edges = np.unique(np.concatenate([edges for edges, turns in steps]))
+    middles = (edges[:-1] + edges[1:]) / 2
+    table = np.empty((len(middles), len(steps)), dtype=np.int64)
+
+    for g, (game_edges, turns) in enumerate(steps):
+        table[:, g] = turns[np.searchsorted(game_edges, middles) - 1]
+
+    return edges, table, replays
+
+
+def best(edges, table):
+    """
+    Return the best scoring interval of the angle, its score and weights taken from its middle.
+    """
+    scores = analyze(table)
+    i = int(np.argmax(scores))
+    theta = (edges[i] + edges[i + 1]) / 2
+
+    return (edges[i], edges[i + 1]), scores[i], (math.cos(theta), math.sin(theta))
+
+
+if __name__ == "__main__":
+    edges, table, replays = sweep_all(DATA_MODEL)
+    interval, score, weights = best(edges, table)
+    np.savez(DATA_MODEL + "/angle_sweep.npz", edges=edges, turns=table)
+
+    print("%d intervals from %d replays" % (len(table), replays))
+    print("best angle %s, score %f, weights %s" % (interval, score, weights))
@@ -0,0 +1,207 @@
+"""
+Benchmarks the solver's hot paths on fixed games of the fasttext archive: warm (best of several runs)
+and cold (first call in a fresh interpreter with an empty Numba cache), per game and over the whole
+archive, in one process and pooled, with the peak memory each allocates. Results are compared with
+saved baselines, and the run fails when any case gets slower or bigger by more than THRESHOLD.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+DATA_MODEL = "fasttext"
+GAMES = (0, 42, 189, 377)
+BASELINE = "benchmark_baseline.json"
+THRESHOLD = 0.25
+# Measurements below these are too small to time or trace reliably, and are never counted as regressions.
+FLOOR = {"warm seconds": 1e-3, "peak bytes": 1 << 20}
+REPEAT = 5
+
+
+def cases():
+    """
+    Return every benchmark as a name mapped to a function that sets up a case and returns the call
+    to time, along with how many times to repeat it when warm.
+    """
+    from game_master import (
+        WEIGHTS, ScoreTable, calcConductance, calcDensity, childPq, combinations, genPq, linkPq, partitionAll, play, pop
+    )
+    from game_store import GameStore
+    from generate_outcomes import create_outcomes_parallel, simulate
+
+    def game(n):
+        return ScoreTable(GameStore.open(DATA_MODEL)[n], sizes=(3,))
+
+    def guess(n):
+        table = game(n)
+        return table, pop(genPq(table, WEIGHTS))[0]
+
+    def first_pop(n):
+        table = game(n)
+        return lambda: pop(genPq(table, WEIGHTS))
+
+    def linked(n):
+        table, arr = guess(n)
+        return lambda: linkPq(arr, table, WEIGHTS)
+
+    def children(n):
+        table, arr = guess(n)
+        return lambda: pop(childPq(arr[:3], table, WEIGHTS))
+
+    def played(n):
+        return lambda: play(n, DATA_MODEL, WEIGHTS)
+
+    def subsets(kernel):
+        def setup():
+            adj = GameStore.open(DATA_MODEL)[GAMES[0]]
+            combos = combinations(range(16), 4)
+            return lambda: [kernel(arr, adj) for arr in combos]
+
+        return setup, REPEAT
+
+    def per_game(call):
+        def setup():
+            runs = [call(n) for n in GAMES]
+            return lambda: [run() for run in runs]
+
+        return setup, REPEAT
+
+    all_games = range(len(GameStore.open(DATA_MODEL)))
+
+    return {
+        "calcDensity, every 4-subset": subsets(calcDensity),
+        "calcConductance, every 4-subset": subsets(calcConductance),
+        "genPq, first pop": per_game(first_pop),
+        "linkPq": per_game(linked),
+        "childPq, first pop": per_game(children),
+        "play, per game": per_game(played),
+        "play, full archive": (lambda: lambda: [play(n, DATA_MODEL, WEIGHTS) for n in all_games], 3),
+        "create_outcomes, full archive": (lambda: lambda: simulate(all_games, DATA_MODEL, WEIGHTS), REPEAT),
+        "create_outcomes, kernel": (
+            lambda: lambda: simulate(all_games, DATA_MODEL, WEIGHTS, backend="kernel"), REPEAT
+        ),
+        "partition, full archive": (lambda: lambda: partitionAll(all_games, DATA_MODEL, WEIGHTS), REPEAT),
+        "create_outcomes, pool of 4": (
+            lambda: lambda: create_outcomes_parallel(len(all_games), DATA_MODEL, WEIGHTS, 4), 1
+        ),
+    }
+
+
+def warm(name):
+    """
+    Run a case once to compile and load everything it needs, then time the best of its repeats
+    and trace its peak memory. Returns the seconds and bytes.
+    """
+    setup, repeat = cases()[name]
+    run = setup()
+    run()
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return best, peak
+
+
+def once(name):
+    """
+    Time setting up and running a case for the first time, compiling whatever it needs on the way.
+    """
+    setup, _ = cases()[name]
+    start = time.perf_counter()
+    setup()()
+    return time.perf_counter() - start
+
+
+def cold(name):
+    """
+    Time the first run of a case in a fresh interpreter with an empty Numba cache.
+    """
+    with tempfile.TemporaryDirectory() as cache:
+        env = dict(os.environ, NUMBA_CACHE_DIR=cache)
+        code = "import benchmark; print(benchmark.once(%r))" % name
+        out = subprocess.run([sys.executable, "-c", code], check=True, env=env, capture_output=True, text=True)
+        return float(out.stdout.split()[-1])
+
+
+def run(names=None, with_cold=True):
+    """
+    Run the benchmarks, returning the results of each as a dict of its measurements.
+    """
+    results = {}
+
+    for name in names or cases():
+        seconds, peak = warm(name)
+        results[name] = {"warm seconds": seconds, "peak bytes": peak}
+
+        if with_cold:
+            results[name]["cold seconds"] = cold(name)
+
+    return results
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """
+    Return every measurement that grew past its baseline by more than 'threshold', as (case, measure, baseline, now).
+    """
+    regressions = []
+
+    for name, measures in results.items():
+        for measure, value in measures.items():
+            before = baseline.get(name, {}).get(measure)
+
+            if before is None or max(value, before) < FLOOR.get(measure, 0):
+                continue
+
+            if value > before * (1 + threshold):
+                regressions.append((name, measure, before, value))
+
+    return regressions
+
+
+def report(results, baseline):
+    """
+    Print every measurement next to its baseline.
+    """
+    for name, measures in results.items():
+        for measure, value in measures.items():
+            before = baseline.get(name, {}).get(measure)
+            change = "" if not before else f"{(value / before - 1) * 100:+8.1f}%"
+            print(f"{name:<34}{measure:<14}{value:14.6g}{change}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    threshold = float(args[args.index("--threshold") + 1]) if "--threshold" in args else THRESHOLD
+    results = run(with_cold="--no-cold" not in args)
+    baseline = {}
+
+    if os.path.exists(BASELINE):
+        with open(BASELINE) as file:
+            baseline = json.load(file)
+
+    report(results, baseline)
+
+    if "--save" in args or not baseline:
+        with open(BASELINE, "w") as file:
+            json.dump(results, file, indent=1)
+        print("saved baselines to " + BASELINE)
+
+    else:
+        regressions = compare(results, baseline, threshold)
+
+        for name, measure, before, value in regressions:
+            print(f"REGRESSION {name}, {measure}: {before:.6g} -> {value:.6g}")
+
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,123 @@
+"""
+Keeps a compact, vocabulary-restricted copy of a data model's word vectors: float16 unit vectors and
+the words they belong to, memory-mapped, with an open-addressing hash index from word to row.
+Enough to build the adjacency of a new puzzle without loading the full embedding model.
+"""
+
+import os
+import zlib
+import numpy as np
+
+
+def slot(word, capacity):
+    """
+    Return the first slot of a word in a hash index of the given (power of two) capacity.
+    """
+    return zlib.crc32(word.encode("utf8")) & (capacity - 1)
+
+
+class EmbeddingStore:
+    """
+    Memory-mapped embedding table of a data model. Words are looked up lowercased.
+    """
+
+    FILES = ("embeddings.npy", "vocab.npy")
+    _open = {}
+
+    def __init__(self, word_data, vectors, vocab, index):
+        self.word_data = word_data
+        self.vectors = vectors
+        self.vocab = vocab
+        self.index = index
+
+    def __len__(self):
+        return len(self.vocab)
+
+    def __contains__(self, word):
+        return self.row(word) != -1
+
+    def row(self, word):
+        """
+        Return the row of a word in the table, or -1 if it is not in the vocabulary.
+        """
+        word = word.lower()
+        i = slot(word, len(self.index))
+
+        while self.index[i] != -1:
+            if self.vocab[self.index[i]] == word:
+                return int(self.index[i])
+            i = (i + 1) & (len(self.index) - 1)
+
+        return -1
+
+    def lookup(self, words):
+        """
+        Return the float32 unit vectors of the given words, raising KeyError for unknown words.
+        """
+        rows = [self.row(word) for word in words]
+        unknown = [word for word, row in zip(words, rows) if row == -1]
+
+        if unknown:
+            raise KeyError("not in the vocabulary of %s: %s" % (self.word_data, ", ".join(unknown)))
+
+        return self.vectors[rows].astype(np.float32)
+
+    def adjacency(self, words):
+        """
+        Build the cosine similarity matrix of the given words.
+        """
+        vectors = self.lookup(words)
+        return vectors @ vectors.T
+
+    @staticmethod
+    def stale(word_data):
+        """
+        Check whether the hash index of a data model is missing or older than its vocabulary.
+        """
+        target = word_data + "/vocab_index.npy"
+        return not os.path.exists(target) or os.path.getmtime(target) < os.path.getmtime(word_data + "/vocab.npy")
+
+    @staticmethod
+    def build(word_data):
+        """
+        Build the hash index of the vocabulary written by extract: an int32 table, at most half full,
+        holding the row of each word at its slot or the next free one after it, and -1 in empty slots.
+        """
+        vocab = np.load(word_data + "/vocab.npy", mmap_mode="r")
+        capacity = 1 << max(len(vocab) * 2 - 1, 1).bit_length()
+        index = np.full(capacity, -1, dtype=np.int32)
+
+        for row, word in enumerate(vocab.tolist()):
+            i = slot(word, capacity)
+
+            while index[i] != -1:
+                i = (i + 1) & (capacity - 1)
+
+            index[i] = row
+
+        np.save(word_data + "/vocab_index.npy", index)
+
+    @classmethod
+    def load(cls, word_data):
+        """
+        Memory-map the embedding files of a data model.
+        """
+        return cls(
+            word_data,
+            np.load(word_data + "/embeddings.npy", mmap_mode="r"),
+            np.load(word_data + "/vocab.npy", mmap_mode="r"),
+            np.load(word_data + "/vocab_index.npy", mmap_mode="r"),
+        )
+
+    @classmethod
+    def open(cls, word_data):
+        """
+        Return the embedding table of a data model, indexing it first if needed. Each table is opened once per process.
+        """
+        if word_data not in cls._open:
+            if cls.stale(word_data):
+                cls.build(word_data)
+
+            cls._open[word_data] = cls.load(word_data)
+
+        return cls._open[word_data]
@@ -1,24 +1,27 @@
 import re
+import os
+import json
+import sys
+import hashlib
 import numpy as np
-import gensim.downloader as api
 
 """
 Creates a folder with a number of .npy files containing adjacency graphs of every connections game's words cosine similarity.
 """
 
 
-def extract(file_path):
-    connections = []
+def puzzles(file_path):
+    puzzles = []
 
     with open(file_path, encoding="utf8") as file:
         lines = file.readlines()
-        index = False
+        number = None
         temp = []
 
         for line in lines:
 
-            if index == False:
-                index = True
+            if number is None:
+                number = int(re.search(r"Connections (\d+)", line).group(1))
                 continue
 
             else:
@@ -27,11 +30,15 @@ def extract(file_path):
                 temp += re.search(pattern, line).group(1).split(", ")
 
             if len(temp) == 16:
-                connections.append(temp)
-                index = False
+                puzzles.append((number, temp))
+                number = None
                 temp = []
-                
-    return connections
+
+    return puzzles
+
+
+def extract(file_path):
+    return [words for number, words in puzzles(file_path)]
 
 def word_similarity(word1, word2, model):
 
@@ -45,32 +52,52 @@ def word_similarity(word1, word2, model):
         return None
 
 
-def create(word_data, model):
-    matrices = []  
-    index = []    
-    simil = None
+def unit_vectors(word_data, model):
+    """
+    Look up every unique (lowercased) word once and normalize all the vectors in bulk.
+    The model can be anything indexable by word that raises KeyError for unknown words,
+    like a gensim KeyedVectors or a plain dict of vectors.
+    Returns a word to row index and the matrix of unit vectors; unknown words are left out.
+    """
+    index = {}
+    vectors = []
 
-    for words in word_data:
-        matrix = []
-        for target in words:
-            temp = []
-            for word in words:
-                simil = word_similarity(target, word, model)
-                if simil is None:
-                    break
-                temp.append(float(simil))
+    for word in sorted({word.lower() for words in word_data for word in words}):
+        try:
+            vectors.append(np.asarray(model[word], dtype=np.float32))
+        except KeyError:
+            continue
+        index[word] = len(index)
 
-            if simil is None:
-                break
-            matrix.append(temp)
+    vectors = np.array(vectors, dtype=np.float32).reshape(len(index), -1 if index else 0)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
 
-        if simil is not None:
-            matrices.append(np.array(matrix))
-            index.append(words)  
+    return index, vectors
 
 
-    np.save(MODEL_NAME + "/data.npy", np.array(matrices))
-    np.save(MODEL_NAME + "/word_data.npy", np.array(index))
+def similarities(word_data, model):
+    """
+    Build the cosine similarity matrix of every game whose words are all known to the model,
+    stacked into one (N, 16, 16) array by a single batched product.
+    Returns the games that were kept and their matrices.
+    """
+    index, vectors = unit_vectors(word_data, model)
+    games = [words for words in word_data if all(word.lower() in index for word in words)]
+
+    if not games:
+        return games, np.empty((0, 16, 16))
+
+    rows = np.array([[index[word.lower()] for word in words] for words in games], dtype=np.int64)
+    stacked = vectors[rows.reshape(len(games), 16)]
+
+    return games, np.einsum("nid,njd->nij", stacked, stacked)
+
+
+def create(word_data, model):
+    games, matrices = similarities(word_data, model)
+
+    np.save(MODEL_NAME + "/data.npy", matrices.astype(np.float64))
+    np.save(MODEL_NAME + "/word_data.npy", np.array(games))
 
 
 
@@ -88,7 +115,197 @@ def clean(word_data, model):
                 print(f"{e}")
 
 
+def missing(words, model):
+    """
+    List the words of a puzzle that the model does not know.
+    """
+    unknown = []
+
+    for word in words:
+        try:
+            model[word.lower()]
+        except KeyError:
+            unknown.append(word)
+
+    return unknown
+
+
+def content_hash(words):
+    """
+    Hash the words of a puzzle, in order, to notice when a puzzle's entry is edited.
+    """
+    return hashlib.sha256("\n".join(words).encode("utf8")).hexdigest()[:16]
+
+
+def load_manifest():
+    """
+    Load the manifest of the model's store: the row and content hash of every stored puzzle,
+    and the puzzles skipped for out-of-vocabulary words.
+    Stores built before manifests existed are indexed by matching their words to the puzzle file.
+    Rows past the manifest's count are dropped, as they come from a build that never committed.
+    """
+    path = MODEL_NAME + "/manifest.json"
+    data = np.load(MODEL_NAME + "/data.npy") if os.path.exists(MODEL_NAME + "/data.npy") else np.empty((0, 16, 16))
+    words = np.load(MODEL_NAME + "/word_data.npy") if os.path.exists(MODEL_NAME + "/word_data.npy") else np.empty((0, 16), dtype=str)
+
+    if os.path.exists(path):
+        with open(path, encoding="utf8") as file:
+            manifest = json.load(file)
+
+    else:
+        rows = {tuple(row): i for i, row in enumerate(words.tolist())}
+        manifest = {"count": len(words), "games": {}, "skipped": {}}
+
+        for number, game in puzzles("extract/full_words.txt"):
+            if tuple(game) in rows:
+                manifest["games"][str(number)] = {"row": rows[tuple(game)], "hash": content_hash(game)}
+
+    return manifest, data[:manifest["count"]], words[:manifest["count"]]
+
+
+def save_atomic(path, write):
+    """
+    Write a file through a temporary file in the same folder, then swap it into place.
+    """
+    temp = path + ".tmp"
+
+    with open(temp, "wb") as file:
+        write(file)
+
+    os.replace(temp, path)
+
+
+def update(file_path, load_model):
+    """
+    Incrementally update the model's store from the puzzle file: only puzzles that are new, or
+    whose words changed, are computed; new ones are appended and changed ones replaced in place.
+    Puzzles with out-of-vocabulary words are recorded as skipped and not retried until they change.
+    The model is only loaded, through load_model, when there is something to compute.
+    Returns the puzzle numbers that were added or updated.
+    """
+    manifest, data, words = load_manifest()
+    pending = []
+
+    for number, game in puzzles(file_path):
+        key, digest = str(number), content_hash(game)
+        known = manifest["games"].get(key) or manifest["skipped"].get(key)
+
+        if known is None or known["hash"] != digest:
+            pending.append((key, game, digest))
+
+    if not pending:
+        if not os.path.exists(MODEL_NAME + "/manifest.json"):
+            save_atomic(MODEL_NAME + "/manifest.json", lambda file: file.write(json.dumps(manifest, indent=1).encode("utf8")))
+        return []
+
+    model = load_model()
+    games, matrices = similarities([game for key, game, digest in pending], model)
+    computed = {tuple(game): matrix for game, matrix in zip(games, matrices)}
+    data = list(data.astype(np.float64))
+    words = list(words)
+    changed = []
+    dropped = set()
+
+    for key, game, digest in pending:
+
+        if tuple(game) not in computed:
+            if key in manifest["games"]:
+                dropped.add(manifest["games"].pop(key)["row"])
+            manifest["skipped"][key] = {"hash": digest, "missing": missing(game, model)}
+            continue
+
+        if key in manifest["games"]:
+            row = manifest["games"][key]["row"]
+            data[row] = computed[tuple(game)]
+            words[row] = np.array(game)
+        else:
+            row = len(data)
+            data.append(computed[tuple(game)])
+            words.append(np.array(game))
+
+        manifest["skipped"].pop(key, None)
+        manifest["games"][key] = {"row": row, "hash": digest}
+        changed.append(int(key))
+
+    # Stored puzzles that now have out-of-vocabulary words are taken out, moving the rows after them up.
+    if dropped:
+        keep = [row for row in range(len(data)) if row not in dropped]
+        moved = {row: i for i, row in enumerate(keep)}
+        data = [data[row] for row in keep]
+        words = [words[row] for row in keep]
+
+        for entry in manifest["games"].values():
+            entry["row"] = moved[entry["row"]]
+
+    manifest["count"] = len(data)
+
+    save_atomic(MODEL_NAME + "/data.npy", lambda file: np.save(file, np.array(data, dtype=np.float64).reshape(-1, 16, 16)))
+    save_atomic(MODEL_NAME + "/word_data.npy", lambda file: np.save(file, np.array(words).reshape(-1, 16)))
+    save_atomic(MODEL_NAME + "/manifest.json", lambda file: file.write(json.dumps(manifest, indent=1).encode("utf8")))
+
+    return changed
+
+
+def export(word_data, model, top=50000):
+    """
+    Write the compact embedding table opened by embedding_store: the float16 unit vectors of every
+    word of the puzzles plus the model's 'top' most frequent words (when it lists them, like a gensim
+    KeyedVectors' index_to_key), and the lowercased words themselves. Returns the vocabulary size.
+    """
+    words = {word.lower() for game in word_data for word in game}
+    words.update(word.lower() for word in getattr(model, "index_to_key", [])[:top])
+    index, vectors = unit_vectors([sorted(words)], model)
+
+    save_atomic(MODEL_NAME + "/embeddings.npy", lambda file: np.save(file, vectors.astype(np.float16)))
+    save_atomic(MODEL_NAME + "/vocab.npy", lambda file: np.save(file, np.array(list(index))))
+
+    return len(index)
+
+
+def ensemble(names):
+    """
+    Stack the stores of several models into the store of their ensemble, named by joining their names
+    with "+": a (models, N, 16, 16) data.npy of the puzzles every model knows, in the first model's
+    order, and their word_data.npy. Returns the name of the ensemble.
+    """
+    archives = [(np.load(name + "/data.npy"), np.load(name + "/word_data.npy")) for name in names]
+    rows = [{tuple(game): i for i, game in enumerate(words.tolist())} for data, words in archives]
+    games = [game for game in archives[0][1].tolist() if all(tuple(game) in row for row in rows)]
+    tensor = np.stack([data[[row[tuple(game)] for game in games]] for (data, words), row in zip(archives, rows)])
+    name = "+".join(names)
+
+    os.makedirs(name, exist_ok=True)
+    save_atomic(name + "/data.npy", lambda file: np.save(file, tensor.astype(np.float64)))
+    save_atomic(name + "/word_data.npy", lambda file: np.save(file, np.array(games).reshape(-1, 16)))
+
+    return name
+
+
+# The gensim model each data model's store is built from.
+MODELS = {
+    "fasttext": "fasttext-wiki-news-subwords-300",
+    "glove": "glove-wiki-gigaword-300",
+    "word2vec": "word2vec-google-news-300",
+}
+
 MODEL_NAME = "fasttext"
-data = extract("extract/full_words.txt")
-model = api.load("fasttext-wiki-news-subwords-300")
-create(data, model)
+
+if __name__ == "__main__":
+    import functools
+
+    if "--ensemble" in sys.argv:
+        print(ensemble(sys.argv[sys.argv.index("--ensemble") + 1:]))
+        sys.exit()
+
+    import gensim.downloader as api
+
+    if "--model" in sys.argv:
+        MODEL_NAME = sys.argv[sys.argv.index("--model") + 1]
+
+    load_model = functools.lru_cache(maxsize=None)(lambda: api.load(MODELS[MODEL_NAME]))
+    os.makedirs(MODEL_NAME, exist_ok=True)
+
+    print(update("extract/full_words.txt", load_model))
+
+    if "--export" in sys.argv:
+        print(export(extract("extract/full_words.txt"), load_model()))
@@ -0,0 +1,253 @@
+"""
+Precomputes the weight-independent features (conductance and density) of every candidate subset,
+for every game, model and reachable board state, so evaluating a set of weights only re-ranks cached arrays.
+"""
+
+import functools
+import os
+import numpy as np
+from game_store import GameStore
+from game_master import Feedback, ScoreTable, check, combinations, combine, toMask, toMasks
+
+GROUPS = [toMask(range(g * 4, (g * 4) + 4)) for g in range(4)]
+STATES = 1 << len(GROUPS)
+FULL = (1 << 16) - 1
+
+
+def stateMask(state):
+    """
+    Return the mask of nodes still available once the groups flagged in 'state' are solved.
+    """
+    avail = FULL
+
+    for g in range(len(GROUPS)):
+        if (state >> g) & 1:
+            avail &= ~GROUPS[g]
+
+    return avail
+
+
+@functools.lru_cache(maxsize=None)
+def layout(k):
+    """
+    Return the rows of the available k-subsets of every board state concatenated, the offsets
+    of each state into them, for every state the position of each row (-1 when solved away)
+    and the mask of each row.
+    """
+    masks = toMasks(combinations(range(16), k))
+    rows = []
+    offsets = [0]
+    positions = np.full((STATES, len(masks)), -1, dtype=np.int64)
+
+    for state in range(STATES):
+        alive = np.flatnonzero((masks & ~stateMask(state)) == 0)
+        positions[state][alive] = np.arange(len(alive))
+        rows.append(alive)
+        offsets.append(offsets[-1] + len(alive))
+
+    return np.concatenate(rows), np.array(offsets), positions, masks
+
+
+def build(store):
+    """
+    Calculate the features of every game of a store, as (N, models, ...) arrays.
+    """
+    features = {}
+
+    for k in ScoreTable.SIZES:
+        rows, offsets, _, _ = layout(k)
+        features["conductance%d" % k] = np.empty((len(store), store.models, offsets[-1]))
+        features["density%d" % k] = np.empty((len(store), store.models, len(combinations(range(16), k))))
+
+    for n in range(len(store)):
+        table = ScoreTable(store[n])
+
+        for k in ScoreTable.SIZES:
+            features["density%d" % k][n] = table.density[k]
+
+        for state in range(STATES):
+            table.reset(stateMask(state))
+
+            for k in ScoreTable.SIZES:
+                rows, offsets, _, _ = layout(k)
+                features["conductance%d" % k][n][:, offsets[state]:offsets[state + 1]] = (
+                    table.conductance[k][:, rows[offsets[state]:offsets[state + 1]]]
+                )
+
+    return features
+
+
+def path(word_data):
+    """
+    Return the location of the feature cache of a data model.
+    """
+    return word_data + "/features.npz"
+
+
+@functools.lru_cache(maxsize=None)
+def load(word_data):
+    """
+    Load the feature cache of a data model, building and saving it first if it is missing or stale.
+    Caches from before features had a model axis are rebuilt too.
+    """
+    store = GameStore.open(word_data)
+    source = word_data + "/adjacency.npy"
+
+    if os.path.exists(path(word_data)) and os.path.getmtime(path(word_data)) >= os.path.getmtime(source):
+        with np.load(path(word_data)) as cached:
+            features = {key: cached[key] for key in cached.files}
+
+        if features["density4"].ndim == 3:
+            return features
+
+    features = build(store)
+    np.savez(path(word_data), **features)
+    return features
+
+
+class Ranking:
+    """
+    Candidates of one board state ordered like the priority queues of game_master: by descending
+    score, ties broken by the lowest subset. 'taken' holds the positions of the subsets popped.
+    """
+
+    def __init__(self, k, rows):
+        self.k = k
+        self.rows = rows
+        self.i = 0
+        self.taken = []
+
+    def pop(self, feedback=None):
+        """
+        Pop the best remaining subset that 'feedback' has not ruled out, or None once there are none left.
+        """
+        masks = layout(self.k)[3]
+
+        while self.i < len(self.rows):
+            row = self.rows[self.i]
+            self.i += 1
+
+            if feedback is None or feedback.consistent(masks[row]):
+                self.taken.append(self.i - 1)
+                return combinations(range(16), self.k)[row].tolist()
+
+        return None
+
+
+def candidates(features, n, k, state, within=None, containing=0):
+    """
+    Return the rows of the available k-subsets of game n in a board state that lie within one
+    mask and contain another, with their cached conductance and density, a row per model.
+    """
+    rows, offsets, positions, masks = layout(k)
+    rows = rows[offsets[state]:offsets[state + 1]]
+    masks = masks[rows]
+    keep = (masks & containing) == containing
+
+    if within is not None:
+        keep &= (masks & ~within) == 0
+
+    rows = rows[keep]
+    conductance = features["conductance%d" % k][n][:, offsets[state] + positions[state][rows]]
+    density = features["density%d" % k][n][:, rows]
+
+    return rows, conductance, density
+
+
+class Rankings:
+    """
+    Rankings of one game for a whole population of weight vectors. Each ranking is sorted for
+    every weight vector at once the first time any of them needs it.
+    """
+
+    def __init__(self, features, n, population):
+        self.features = features
+        self.n = n
+        self.population = population
+        self.orders = {}
+
+    def rank(self, w, k, state, within=None, containing=0):
+        """
+        Rank the matching available k-subsets of a board state for weight vector w.
+        """
+        key = (k, state, within, containing)
+
+        if key not in self.orders:
+            rows, conductance, density = candidates(self.features, self.n, k, state, within, containing)
+            scores = combine(self.population, conductance, density)
+            self.orders[key] = rows[np.argsort(-scores, axis=1, kind="stable")]
+
+        return Ranking(k, self.orders[key][w])
+
+
+def solved(state, arr):
+    """
+    Return the board state after the group 'arr' is solved.
+    """
+    return state | (1 << GROUPS.index(toMask(arr)))
+
+
+def replayRankings(rankings, w):
+    """
+    Replay game_master.play for weight vector w of a population, returning the number of turns taken.
+    """
+    state = 0
+    feedback = Feedback()
+    turns = 0
+
+    while state != STATES - 1:
+
+        out = -1
+        curr = []
+        pq = rankings.rank(w, 4, state)
+
+        while out == -1:
+            curr = pq.pop(feedback)
+            out = check(curr)
+            feedback.add(curr, out)
+            turns += 1
+
+        if out == 0:
+            trios = rankings.rank(w, 3, state, within=toMask(curr))
+
+            while out != 1:
+                bestTrio = trios.pop()
+                pq = rankings.rank(w, 4, state, containing=toMask(bestTrio))
+                out = 0
+
+                while out == 0:
+                    guess = pq.pop(feedback)
+
+                    if guess is None:
+                        break
+
+                    curr = guess
+                    out = check(curr)
+                    feedback.add(curr, out)
+                    turns += 1
+
+        state = solved(state, curr)
+
+    return turns - 4
+
+
+def replayAll(features, n, population):
+    """
+    Replay game n for every weight vector of an (n_weights, 2 * models) population, returning their turns.
+    """
+    population = np.asarray(population, dtype=np.float64).reshape(-1, 2 * features["density4"].shape[1])
+    rankings = Rankings(features, n, population)
+    turns = np.full(len(population), 99, dtype=np.int64)
+
+    for w in range(len(population)):
+        if population[w].any():
+            turns[w] = replayRankings(rankings, w)
+
+    return turns
+
+
+def replay(features, n, weights):
+    """
+    Replay game_master.play on game n from the cached features, returning the number of turns taken.
+    """
+    return int(replayAll(features, n, [weights])[0])
@@ -4,11 +4,16 @@ Methods used by AI to calculat similarity, and generate the following priority q
 
 
 import numpy as np
-from numba import jit
+from numba import jit, prange
 import heapq
 import itertools
+import functools
+import math
+import solver_stats
+from game_store import GameStore
+from embedding_store import EmbeddingStore
 
-@jit
+@jit(cache=True)
 def calcDensity(arr, adj):
     """
     Calculate the density of connections within a subset of nodes in the adjacency matrix.
@@ -22,7 +27,7 @@ def calcDensity(arr, adj):
     return a / (len(arr) * len(arr))
 
 
-@jit
+@jit(cache=True)
 def calcConductance(arr, adj):
     """
     Calculate the conductance of a subset of nodes in the adjacency matrix.
@@ -33,9 +38,6 @@ def calcConductance(arr, adj):
     for i in arr:
         for j in range(len(adj)):
 
-            if adj[i][j] == -1:
-                continue
-
             if j in arr:
                 inside += adj[i][j] / 4
             else:
@@ -47,91 +49,614 @@ def calcConductance(arr, adj):
     return 1 - outside / ((2 * inside) + outside)
 
 
-def push(pq, id, num):
+@jit(cache=True)
+def calcBatch(combos, adj):
+    """
+    Calculate the conductance and density of every subset (row) of combos in a single call.
+    """
+    conductance = np.empty(len(combos))
+    density = np.empty(len(combos))
+
+    for c in range(len(combos)):
+        conductance[c] = calcConductance(combos[c], adj)
+        density[c] = calcDensity(combos[c], adj)
+
+    return conductance, density
+
+
+@functools.lru_cache(maxsize=None)
+def _combinations(avail, k):
+    combos = np.array(list(itertools.combinations(avail, k)), dtype=np.int64)
+    combos = combos.reshape(math.comb(len(avail), k), k)
+    combos.setflags(write=False)
+    return combos
+
+
+def combinations(avail, k):
+    """
+    Return an (n_combos, k) index array of every k-subset of avail, cached per avail.
+    """
+    return _combinations(tuple(int(i) for i in avail), k)
+
+
+def score(combos, adj, weights):
     """
-    Push an element onto a priority queue with the specified priority.
+    Score every subset of combos as the weighted sum of its conductance and density.
     """
-    heapq.heappush(pq, (-num, id))
+    conductance, density = calcBatch(combos, adj)
+    return (weights[0] * conductance) + (weights[1] * density)
+
+
+def rankPq(combos, scores):
+    """
+    Build a priority queue from an index array of subsets and their scores.
+    """
+    pq = list(zip((-scores).tolist(), combos.tolist()))
+    heapq.heapify(pq)
+    return pq
 
 
 def pop(pq):
     """
     Pop the highest-priority element from a priority queue.
     """
+    if not isinstance(pq, list):
+        return pq.pop()
+
     num, id = heapq.heappop(pq)
     return id, -num
 
 
-def linkPq(arr, adj, weights):
+@jit(cache=True)
+def calcTables(combos, adjs):
     """
-    Generate a priority queue of trios linked to the given subset of nodes, based on conductance and density.
+    Calculate the weight and availability independent parts of every subset of combos, for every
+    model of a (models, 16, 16) adjacency stack in one pass: the inside sum used by conductance,
+    the spill (summed connections from the subset to each outside node) and the density.
+    Each is returned with a leading model axis.
     """
-    pq = []
-    combinations = itertools.combinations(arr, 3)
+    inside = np.zeros((len(adjs), len(combos)))
+    spill = np.zeros((len(adjs), len(combos), adjs.shape[1]))
+    density = np.empty((len(adjs), len(combos)))
 
-    for combo in combinations:
-        combo = list(combo)
-        push(
-            pq,
-            combo,
-            (weights[0] * calcConductance(combo, adj))
-            + (weights[1] * calcDensity(combo, adj)),
-        )
+    for m in range(len(adjs)):
+        adj = adjs[m]
 
-    return pq
+        for c in range(len(combos)):
+            arr = combos[c]
+            mask = 0
+
+            for i in arr:
+                mask |= 1 << i
+
+            for i in arr:
+                for j in range(len(adj)):
+
+                    if (mask >> j) & 1:
+                        inside[m, c] += adj[i, j] / 4
+                    else:
+                        spill[m, c, j] += adj[i, j]
+
+            density[m, c] = calcDensity(arr, adj)
 
+    return inside, spill, density
 
-def childPq(arr, adj, avail, weights):
+
+@jit(cache=True)
+def calcOutside(spill, avail):
     """
-    Generate a priority queue of child nodes linked to the given subset, based on conductance and density.
+    Sum the spill of every subset over the nodes that are still available.
+    """
+    outside = np.zeros(len(spill))
+
+    for c in range(len(spill)):
+        for j in range(len(avail)):
+
+            if avail[j]:
+                outside[c] += spill[c][j]
+
+    return outside
+
+
+def calcConductances(inside, outside):
+    """
+    Calculate the conductance of every subset from its inside and outside sums.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        conductance = 1 - outside / ((2 * inside) + outside)
+
+    conductance[(outside == 0) | (inside == 0)] = -1
+
+    return conductance
+
+
+def stack(adj):
+    """
+    Return an adjacency as a (models, 16, 16) stack, adding the model axis to a single model's.
+    """
+    return adj[None] if adj.ndim == 2 else adj
+
+
+def combine(weights, conductance, density):
+    """
+    Score subsets as the weighted sum of their conductance and density, summed over models.
+    'weights' holds a conductance and a density weight per model, (c_1, d_1, c_2, d_2, ...),
+    or a row of them per weight vector to score a whole population at once; 'conductance' and
+    'density' hold a row per model.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    weights = weights.reshape(weights.shape[:-1] + (len(conductance), 2))
+    scores = 0.0
+
+    for m in range(len(conductance)):
+        scores = scores + (weights[..., m, 0, None] * conductance[m]) + (weights[..., m, 1, None] * density[m])
+
+    return scores
+
+
+@jit(cache=True)
+def calcBounds(members, pool, adj, rowsums, need, weights):
+    """
+    Calculate an upper bound on the score of every subset made of 'members', pool[c] and
+    need - 1 more nodes taken from the pool after c. Each candidate node's share of the inside
+    sum is bounded from its largest pairwise similarities left in the pool, and the best ratio of
+    inside to outside sums over those shares is then found exactly (Dinkelbach's method).
+    """
+    k = len(members) + need
+    bounds = np.full(len(pool), -np.inf)
+
+    for c in range(len(pool)):
+        rest = pool[c + 1:]
+        q = need - 1
+
+        if len(rest) < q:
+            continue
+
+        node = np.append(members, pool[c])
+        inside = 0.0
+        row = 0.0
+
+        for i in node:
+            row += rowsums[i]
+            for j in node:
+                inside += adj[i][j]
+
+        hi = np.empty(len(rest))
+        lo = np.empty(len(rest))
+
+        for x in range(len(rest)):
+            link = adj[rest[x]][rest[x]]
+
+            for i in node:
+                link += adj[i][rest[x]] + adj[rest[x]][i]
+
+            pairs = np.empty(len(rest) - 1)
+            p = 0
+
+            for y in range(len(rest)):
+                if y != x:
+                    pairs[p] = adj[rest[x]][rest[y]]
+                    p += 1
+
+            pairs.sort()
+            hi[x] = link + pairs[len(pairs) - (q - 1):].sum()
+            lo[x] = link + pairs[:q - 1].sum()
+
+        insideHi = inside + np.sort(hi)[len(hi) - q:].sum()
+        insideLo = inside + np.sort(lo)[:q].sum()
+        rowLo = row + np.sort(rowsums[rest])[:q].sum()
+
+        alpha = hi / 2
+        beta = rowsums[rest] - alpha
+        a = inside / 2
+        b = row - a
+
+        if weights[0] == 0:
+            bound = 0.0
+        elif weights[0] > 0 and rowLo > 0 and b + np.sort(beta)[:q].sum() > 0:
+            best = np.argsort(-alpha)[:q]
+            ratio = (a + alpha[best].sum()) / (b + beta[best].sum())
+
+            for _ in range(64):
+                best = np.argsort(-(alpha - ratio * beta))[:q]
+                step = (a + alpha[best].sum()) / (b + beta[best].sum())
+                if step <= ratio:
+                    break
+                ratio = step
+
+            if rowLo - insideHi >= 0:
+                ratio = min(ratio, 1.0)
+
+            bound = weights[0] * ratio
+        else:
+            bound = np.inf
+
+        if weights[1] >= 0:
+            bound += weights[1] * insideHi / (k * k)
+        else:
+            bound += weights[1] * insideLo / (k * k)
+
+        bounds[c] = bound + 1e-9 * (abs(bound) + 1)
+
+    return bounds
+
+
+def toMask(arr):
+    """
+    Convert a subset of node indices into its 16-bit mask.
+    """
+    mask = 0
+
+    for i in arr:
+        mask |= 1 << int(i)
+
+    return mask
+
+
+def toMasks(combos):
+    """
+    Convert an (n_combos, k) index array into an array of 16-bit masks.
+    """
+    return np.bitwise_or.reduce(np.left_shift(1, combos), axis=1).astype(np.int64)
+
+
+# The number of nodes in every 16-bit mask.
+BITS = np.unpackbits(np.arange(1 << 16, dtype=">u2").view(np.uint8)).reshape(-1, 16).sum(axis=1)
+
+
+class ScoreTable:
+    """
+    Conductance and density of every subset of a game of each of 'sizes' (3- and 4-subsets by
+    default), keyed by 16-bit subset masks. play only needs the 3-subsets, as its 4-subsets come
+    from Candidates.
+    Solving a group filters the table down to the subsets that are still available and
+    updates their conductance from the cached spill, instead of rescoring the adjacency.
+    The adjacency is a single model's (16, 16) or an ensemble's (models, 16, 16); either way
+    the conductance and density have a row per model.
+    """
+
+    SIZES = (3, 4)
+
+    def __init__(self, adj, sizes=SIZES):
+        self.adj = adj
+        self.sizes = sizes
+        self.adjs = stack(adj)
+        self.size = adj.shape[-1]
+        self.avail = (1 << self.size) - 1
+        self.combos = {}
+        self.masks = {}
+        self.inside = {}
+        self.spill = {}
+        self.density = {}
+        self.conductance = {}
+        self.alive = {}
+
+        for k in self.sizes:
+            combos = combinations(range(self.size), k)
+            inside, spill, density = calcTables(combos, self.adjs)
+
+            self.combos[k] = combos
+            self.masks[k] = toMasks(combos)
+            self.inside[k] = inside
+            self.spill[k] = spill
+            self.density[k] = density
+            self.alive[k] = np.arange(len(combos))
+
+        self.update()
+
+    def update(self):
+        """
+        Recalculate the conductance of the alive subsets for the current availability.
+        """
+        avail = np.array([(self.avail >> j) & 1 for j in range(self.size)], dtype=np.bool_)
+
+        for k in self.sizes:
+            alive = self.alive[k]
+            self.conductance[k] = np.zeros((len(self.adjs), len(self.masks[k])))
+
+            for m in range(len(self.adjs)):
+                outside = calcOutside(self.spill[k][m][alive], avail)
+                self.conductance[k][m][alive] = calcConductances(self.inside[k][m][alive], outside)
+
+    def solve(self, arr):
+        """
+        Remove a solved subset of nodes, dropping every subset that touches it.
+        """
+        mask = toMask(arr)
+        self.avail &= ~mask
+
+        for k in self.sizes:
+            alive = self.alive[k]
+            self.alive[k] = alive[(self.masks[k][alive] & mask) == 0]
+
+        self.update()
+
+    def reset(self, avail):
+        """
+        Set the available nodes from a mask, keeping only the subsets that lie within it.
+        """
+        self.avail = avail
+
+        for k in self.sizes:
+            self.alive[k] = np.flatnonzero((self.masks[k] & ~avail) == 0)
+
+        self.update()
+
+    def available(self):
+        """
+        Return the sorted list of nodes that are still available.
+        """
+        return [j for j in range(self.size) if (self.avail >> j) & 1]
+
+    def subsets(self, k, within=None, containing=0):
+        """
+        Return the rows of alive k-subsets that lie within one mask and contain another.
+        """
+        rows = self.alive[k]
+        masks = self.masks[k][rows]
+        keep = (masks & containing) == containing
+
+        if within is not None:
+            keep &= (masks & ~within) == 0
+
+        return rows[keep]
+
+    def score(self, k, rows, weights):
+        """
+        Score the given rows as the weighted sum of their conductance and density (see combine).
+        """
+        return combine(weights, self.conductance[k][:, rows], self.density[k][:, rows])
+
+    def rankPq(self, k, rows, weights):
+        """
+        Build a priority queue of the given rows of k-subsets.
+        """
+        return rankPq(self.combos[k][rows], self.score(k, rows, weights))
+
+
+class Candidates:
+    """
+    Lazily ranked k-subsets of the available nodes that contain 'base', best first, ties broken
+    by the lowest subset. Subsets are grown one node at a time in a best-first search: partial
+    subsets wait in the queue under an upper bound of any score they can reach, so only branches
+    that can still beat the best subset found so far are expanded and scored. Branches with at
+    most LEAVES subsets under them are scored in one batch instead of being bounded further.
+    Subsets ruled out by 'feedback' are dropped before they are scored, and when popped if they
+    were ruled out after being queued; until found, they still count towards len.
+    For an ensemble, subsets are scored on every model and bounded by the sum of each model's bound.
     """
-    pq = []
 
-    for i in avail:
-        if i not in arr:
-            combo = arr + [i]
-            push(
-                pq,
-                combo,
-                (weights[0] * calcConductance(combo, adj))
-                + (weights[1] * calcDensity(combo, adj)),
+    LEAVES = 64
+
+    def __init__(self, adj, avail, weights, k, base=(), feedback=None):
+        self.adjs = stack(adj)
+        self.feedback = feedback
+        self.weights = np.array(weights, dtype=np.float64).reshape(len(self.adjs), 2)
+        self.k = k
+        self.base = sorted(int(i) for i in base)
+        self.pool = np.array([i for i in avail if i not in self.base], dtype=np.int64)
+        self.avail = np.zeros(adj.shape[-1], dtype=np.bool_)
+        self.avail[list(avail)] = True
+        self.rowsums = np.asarray(self.adjs, dtype=np.float64)[:, :, self.avail].sum(axis=2)
+        self.left = math.comb(len(self.pool), k - len(self.base))
+        self.pq = [(-np.inf, 0, ())]
+        self.scored = 0
+        self.pushes = 1
+
+    def __len__(self):
+        return self.left
+
+    def expand(self, added):
+        """
+        Replace a partial subset, given by pool positions, with its children.
+        """
+        need = self.k - len(self.base) - len(added)
+        start = added[-1] + 1 if added else 0
+        options = np.arange(start, len(self.pool) - need + 1)
+
+        if math.comb(len(self.pool) - start, need) <= self.LEAVES:
+            members = [self.pool[i] for i in added] + self.base
+            rest = combinations(self.pool[start:], need)
+            combos = np.sort(np.hstack([np.tile(np.array(members, dtype=np.int64), (len(rest), 1)), rest]), axis=1)
+
+            if self.feedback is not None:
+                keep = self.feedback.allowed(toMasks(combos))
+                self.left -= len(combos) - int(keep.sum())
+                combos = combos[keep]
+
+            inside, spill, density = calcTables(combos, self.adjs)
+            conductance = [calcConductances(inside[m], calcOutside(spill[m], self.avail)) for m in range(len(self.adjs))]
+            scores = combine(self.weights.ravel(), conductance, density)
+            self.scored += len(combos)
+            self.pushes += len(combos)
+
+            for combo, num in zip(combos.tolist(), scores.tolist()):
+                heapq.heappush(self.pq, (-num, 1, tuple(combo)))
+
+        else:
+            members = np.array([self.pool[i] for i in added] + self.base, dtype=np.int64)
+            bounds = sum(
+                calcBounds(members, self.pool[start:], self.adjs[m], self.rowsums[m], need, self.weights[m])
+                for m in range(len(self.adjs))
             )
+            self.pushes += len(bounds)
 
-    pop(pq)
+            for i, bound in zip(options.tolist(), bounds.tolist()):
+                heapq.heappush(self.pq, (-bound, 0, added + (i,)))
 
-    return pq
+    def pop(self):
+        """
+        Pop the best remaining subset and its score, or None once there are none left.
+        """
+        while self.pq:
+            num, kind, id = heapq.heappop(self.pq)
+
+            if kind == 1:
+                self.left -= 1
 
+                if self.feedback is None or self.feedback.consistent(toMask(id)):
+                    return list(id), -num
 
-def genPq(adj, avail, weights):
+                continue
+
+            self.expand(id)
+
+        self.left = 0
+        return None
+
+
+class RankedCandidates:
     """
-    Generate a priority queue for all combinations of four available nodes, based on conductance and density.
+    Candidates materialized in rank order from a lazy source, with cached top-k views and
+    O(log n) removal by rank. A Fenwick tree counts the materialized candidates that are still
+    in the queue, so the n-th best is found and removed without popping everything above it.
+    Materialized candidates ruled out by answers to the source's feedback that arrived after
+    them are dropped before the queue is next viewed or removed from.
     """
-    pq = []
-    combinations = itertools.combinations(avail, 4)
 
-    for combo in combinations:
-        combo = list(combo)
-        push(
-            pq,
-            combo,
-            (weights[0] * calcConductance(combo, adj))
-            + (weights[1] * calcDensity(combo, adj)),
-        )
+    def __init__(self, source):
+        self.source = source
+        self.ranked = []
+        self.alive = []
+        self.tree = [0] * 65
+        self.removed = 0
+        self.views = {}
+        self.answers = 0
 
-    return pq
+    def __len__(self):
+        return len(self.ranked) - self.removed + len(self.source)
+
+    def add(self, i, delta):
+        """
+        Add delta to the count at (1-based) position i of the Fenwick tree.
+        """
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def grow(self):
+        """
+        Double the capacity of the Fenwick tree, rebuilding it from the alive flags.
+        """
+        self.tree = [0] * (2 * (len(self.tree) - 1) + 1)
+
+        for i in range(1, len(self.tree)):
+            if i <= len(self.alive):
+                self.tree[i] += self.alive[i - 1]
+            parent = i + (i & -i)
+            if parent < len(self.tree):
+                self.tree[parent] += self.tree[i]
+
+    def prune(self):
+        """
+        Drop the materialized candidates that answers recorded since the last prune rule out.
+        """
+        feedback = self.source.feedback
+
+        if feedback is None or len(feedback.incorrect) + len(feedback.away) == self.answers:
+            return
+
+        self.answers = len(feedback.incorrect) + len(feedback.away)
+
+        for pos, (id, num) in enumerate(self.ranked, 1):
+            if self.alive[pos - 1] and not feedback.consistent(toMask(id)):
+                self.add(pos, -1)
+                self.alive[pos - 1] = 0
+                self.removed += 1
+                self.views.clear()
+
+    def fill(self, n):
+        """
+        Materialize candidates from the source until n of them are in the queue, or it runs out.
+        """
+        while len(self.ranked) - self.removed < n and len(self.source) > 0:
+            candidate = self.source.pop()
+
+            if candidate is None:
+                break
+
+            self.ranked.append(candidate)
+            self.alive.append(1)
+
+            if len(self.ranked) >= len(self.tree):
+                self.grow()
+            else:
+                self.add(len(self.ranked), 1)
 
+    def select(self, rank):
+        """
+        Return the (1-based) position of the candidate with the given rank among those left.
+        """
+        pos = 0
+        step = 1 << (len(self.tree) - 1).bit_length()
 
-@jit
-def purge(adj, indices):
+        while step:
+            if pos + step < len(self.tree) and self.tree[pos + step] < rank:
+                pos += step
+                rank -= self.tree[pos]
+            step >>= 1
+
+        return pos + 1
+
+    def top(self, k):
+        """
+        Return the k best candidates left, with their scores, without removing them.
+        """
+        self.prune()
+
+        if k not in self.views:
+            self.fill(k)
+            count = min(k, len(self.ranked) - self.removed)
+            self.views[k] = [self.ranked[self.select(r) - 1] for r in range(1, count + 1)]
+
+        return self.views[k]
+
+    def remove(self, rank):
+        """
+        Remove and return the candidate with the given (1-based) rank, with its score.
+        """
+        self.prune()
+        self.fill(rank)
+
+        if not 0 < rank <= len(self.ranked) - self.removed:
+            raise IndexError("rank out of range")
+
+        pos = self.select(rank)
+        self.add(pos, -1)
+        self.alive[pos - 1] = 0
+        self.removed += 1
+        self.views.clear()
+
+        return self.ranked[pos - 1]
+
+    def pop(self):
+        """
+        Remove and return the best candidate left, with its score.
+        """
+        return self.remove(1)
+
+
+def linkPq(arr, table, weights):
     """
-    Remove connections in the adjacency matrix for a given set of indices.
+    Generate a priority queue of trios linked to the given subset of nodes, based on conductance and density.
     """
-    for index in indices:
-        for i in range(16):
-            adj[index][i] = -1
-            adj[i][index] = -1
+    return table.rankPq(3, table.subsets(3, within=toMask(arr)), weights)
 
-    return adj
+
+def childPq(arr, table, weights, feedback=None):
+    """
+    Generate a priority queue of child nodes linked to the given subset, based on conductance and density.
+    With 'feedback', only the children it has not ruled out are queued.
+    """
+    return RankedCandidates(Candidates(table.adj, table.available(), weights, 4, base=arr, feedback=feedback))
+
+
+def genPq(table, weights, feedback=None):
+    """
+    Generate a priority queue for all combinations of four available nodes, based on conductance and density.
+    With 'feedback', only the combinations it has not ruled out are queued.
+    """
+    return RankedCandidates(Candidates(table.adj, table.available(), weights, 4, feedback=feedback))
 
 
 def check(lis):
@@ -150,54 +675,826 @@ def check(lis):
     return -1
 
 
-def play(adj_code, word_data, weights):
+class Feedback:
+    """
+    The answers to the guesses of a game so far, as constraints on the groups that can still be
+    right: none shares 3 or more nodes with an incorrect guess, and each shares 0, 1 or 3 nodes with
+    a one away guess (3 with the group it is one away from, 1 with the group of its odd node out).
+    Guesses already made are ruled out by their own answers.
+    """
+
+    def __init__(self):
+        self.incorrect = []
+        self.away = []
+
+    def add(self, arr, out):
+        """
+        Record the answer to a guess.
+        """
+        if out == -1:
+            self.incorrect.append(toMask(arr))
+        elif out == 0:
+            self.away.append(toMask(arr))
+
+    def allowed(self, masks):
+        """
+        Check an array of subset masks against every answer at once.
+        """
+        keep = np.ones(len(masks), dtype=np.bool_)
+
+        for mask in self.incorrect:
+            keep &= BITS[masks & mask] <= 2
+
+        for mask in self.away:
+            shared = BITS[masks & mask]
+            keep &= (shared != 2) & (shared != 4)
+
+        return keep
+
+    def consistent(self, mask):
+        """
+        Check one subset mask against every answer.
+        """
+        return all(BITS[mask & g] <= 2 for g in self.incorrect) and all(
+            BITS[mask & g] not in (2, 4) for g in self.away
+        )
+
+
+def play(adj_code, word_data, weights, strategy="greedy"):
     """
     Main function to simulate the AI, returning the number of turns taken.
+    The "greedy" strategy guesses the best single group, "partition" the best group of the best
+    partition of the board (see partitionKernel).
+    While solver_stats.STATS is set, greedy games are recorded in it.
     """
-    if weights == (0, 0):
+    if not any(weights):
         return 99
 
-    adj = np.load(word_data + "/" + "data.npy", allow_pickle=True)[adj_code]
-    avail = range(16)
+    if strategy == "partition":
+        return int(partitionAll([adj_code], word_data, weights)[0])
+
+    stats = solver_stats.STATS
+    table = ScoreTable(GameStore.open(word_data)[adj_code], sizes=(3,))
+    feedback = Feedback()
     turns = 0
+    gen, link, child, take, guess, purge = genPq, linkPq, childPq, pop, check, table.solve
+
+    if stats is not None:
+        stats.start(adj_code)
+        gen = stats.builder("genPq", genPq)
+        link = stats.builder("linkPq", linkPq)
+        child = stats.builder("childPq", childPq)
+        take, guess, purge = stats.popper(pop), stats.checker(check), stats.timer("purge", table.solve)
 
-    while len(avail) != 0:
+    while table.avail != 0:
 
         out = -1
         curr = []
-        pq = genPq(adj, avail, weights)
+        pq = gen(table, weights, feedback)
 
         while out == -1:
-            curr = pop(pq)[0]
-            out = check(curr)
+            curr = take(pq)[0]
+            out = guess(curr)
+            feedback.add(curr, out)
             turns += 1
 
         if out == 0:
-            trios = linkPq(curr, adj, weights)
-            out = -1
+            trios = link(curr, table, weights)
 
+            # Try the children of each trio of the one away guess until one is right, moving on to
+            # the next trio when a child is incorrect or none are left that fit every answer.
             while out != 1:
-                bestTrio = pop(trios)[0]
-                pq = childPq(bestTrio, adj, avail, weights)
-                curr = pop(pq)[0]
-                out = check(curr)
-                turns += 1
+                bestTrio = take(trios)[0]
+                pq = child(bestTrio, table, weights, feedback)
+                out = 0
 
-                while out == 0:
-                    curr = pop(pq)[0]
-                    out = check(curr)
+                while out == 0 and len(pq.top(1)) > 0:
+                    curr = take(pq)[0]
+                    out = guess(curr)
+                    feedback.add(curr, out)
                     turns += 1
 
+        purge(curr)
+
+    if stats is not None:
+        stats.finish(turns - 4)
+
+    return turns - 4
+
+@jit(cache=True)
+def popcount(mask):
+    """
+    Count the nodes in a subset mask.
+    """
+    count = 0
+
+    while mask:
+        mask &= mask - 1
+        count += 1
+
+    return count
+
+
+@jit(cache=True)
+def checkMask(mask, groups):
+    """
+    Check a subset mask against the answer group masks, like check.
+    """
+    for g in groups:
+        if mask == g:
+            return 1
+        elif popcount(mask & g) == 3:
+            return 0
+
+    return -1
+
+
+@jit(cache=True)
+def scoreKernel(inside, spill, density, avail, weights, scores):
+    """
+    Score every subset for the current availability into 'scores', exactly as ScoreTable does,
+    summing over the models of the calcTables stack with a (models, 2) row of weights each.
+    """
+    for c in range(inside.shape[1]):
+        score = 0.0
+
+        for m in range(len(inside)):
+            outside = 0.0
+
+            for j in range(len(avail)):
+                if avail[j]:
+                    outside += spill[m, c, j]
+
+            if outside == 0 or inside[m, c] == 0:
+                conductance = -1.0
             else:
-                adj = purge(adj, curr)
-                avail = list(set(avail) - set(curr))
+                conductance = 1 - outside / ((2 * inside[m, c]) + outside)
+
+            score = score + (weights[m, 0] * conductance) + (weights[m, 1] * density[m, c])
+
+        scores[c] = score
+
+
+@jit(cache=True)
+def bestKernel(scores, masks, within, containing, taken):
+    """
+    Return the best subset lying within one mask and containing another that has not been taken
+    or ruled out, ties broken by the lowest subset, or -1 if there is none.
+    """
+    best = -1
+
+    for c in range(len(scores)):
+        if taken[c] or (masks[c] & ~within) != 0 or (masks[c] & containing) != containing:
+            continue
+
+        if best == -1 or scores[c] > scores[best]:
+            best = c
+
+    return best
+
+
+@jit(cache=True)
+def feedbackKernel(masks, curr, out, ruled):
+    """
+    Rule out the subsets an answer to a guess rules out, like Feedback: sharing 3 or more nodes with
+    an incorrect guess, or 2 or 4 with a one away guess.
+    """
+    for c in range(len(masks)):
+        shared = popcount(masks[c] & curr)
+
+        if (out == -1 and shared >= 3) or (out == 0 and (shared == 2 or shared == 4)):
+            ruled[c] = True
+
+
+@jit(cache=True)
+def playKernel(adjs, weights, combos4, masks4, combos3, masks3, groups):
+    """
+    Run play's genPq, check, linkPq, childPq and solve state machine on one game in nopython mode,
+    from its (models, 16, 16) adjacency stack and (models, 2) weights.
+    Returns the number of turns taken, or -1 if a queue runs dry (where play would raise).
+    """
+    inside4, spill4, density4 = calcTables(combos4, adjs)
+    inside3, spill3, density3 = calcTables(combos3, adjs)
+    scores4 = np.empty(len(masks4))
+    scores3 = np.empty(len(masks3))
+    ruled4 = np.zeros(len(masks4), dtype=np.bool_)
+    taken3 = np.zeros(len(masks3), dtype=np.bool_)
+    avail = np.ones(adjs.shape[1], dtype=np.bool_)
+    availMask = (1 << adjs.shape[1]) - 1
+    turns = 0
+
+    while availMask != 0:
+        scoreKernel(inside4, spill4, density4, avail, weights, scores4)
+        scoreKernel(inside3, spill3, density3, avail, weights, scores3)
+
+        out = -1
+        curr = 0
+
+        while out == -1:
+            row = bestKernel(scores4, masks4, availMask, 0, ruled4)
+            if row == -1:
+                return -1
+            curr = masks4[row]
+            out = checkMask(curr, groups)
+            feedbackKernel(masks4, curr, out, ruled4)
+            turns += 1
+
+        if out == 0:
+            taken3[:] = False
+            linked = curr
+
+            while out != 1:
+                trio = bestKernel(scores3, masks3, linked, 0, taken3)
+                if trio == -1:
+                    return -1
+                taken3[trio] = True
+                out = 0
+
+                while out == 0:
+                    row = bestKernel(scores4, masks4, availMask, masks3[trio], ruled4)
+                    if row == -1:
+                        break
+                    curr = masks4[row]
+                    out = checkMask(curr, groups)
+                    feedbackKernel(masks4, curr, out, ruled4)
+                    turns += 1
+
+        availMask &= ~curr
+
+        for j in range(len(avail)):
+            if (curr >> j) & 1:
+                avail[j] = False
+
+    return turns - 4
+
+
+@jit(parallel=True, cache=True)
+def playBatch(tensor, games, weights, combos4, masks4, combos3, masks3, groups):
+    """
+    Run playKernel on many games of a (models, N, 16, 16) tensor in parallel.
+    """
+    turns = np.empty(len(games), dtype=np.int64)
+
+    for g in prange(len(games)):
+        turns[g] = playKernel(tensor[:, games[g]], weights, combos4, masks4, combos3, masks3, groups)
+
+    return turns
+
+
+def playAll(games, word_data, weights):
+    """
+    Compiled version of play for many games at once, returning the number of turns of each.
+    """
+    games = np.asarray(games, dtype=np.int64)
+
+    if not any(weights):
+        return np.full(len(games), 99, dtype=np.int64)
+
+    store = GameStore.open(word_data)
+    combos4 = combinations(range(16), 4)
+    combos3 = combinations(range(16), 3)
+    groups = np.array([toMask(range(g, g + 4)) for g in range(0, 16, 4)], dtype=np.int64)
+    turns = playBatch(
+        store.tensor,
+        games,
+        np.array(weights, dtype=np.float64).reshape(store.models, 2),
+        combos4,
+        toMasks(combos4),
+        combos3,
+        toMasks(combos3),
+        groups,
+    )
+
+    if (turns == -1).any():
+        raise IndexError("pop from empty priority queue")
+
+    return turns
+
+
+# The number of ways to split 16 nodes into four unordered groups of four: 16! / (4!^4 * 4!).
+PARTITIONS = 2627625
+# How many of the best consistent partitions of a board are ranked at a time.
+POOL = 1024
+
+
+@jit(cache=True)
+def lowestGroups(rest):
+    """
+    Return the masks of every 4-subset of the nodes in 'rest' that contains its lowest node.
+    """
+    nodes = np.empty(16, dtype=np.int64)
+    n = 0
+
+    for j in range(16):
+        if (rest >> j) & 1:
+            nodes[n] = j
+            n += 1
+
+    out = np.empty((n - 1) * (n - 2) * (n - 3) // 6, dtype=np.int64)
+    c = 0
+
+    for a in range(1, n):
+        for b in range(a + 1, n):
+            for d in range(b + 1, n):
+                out[c] = (1 << nodes[0]) | (1 << nodes[a]) | (1 << nodes[b]) | (1 << nodes[d])
+                c += 1
+
+    return out
+
+
+@jit(cache=True)
+def partitionTable(rows):
+    """
+    Enumerate every partition of 16 nodes into four groups of four, as rows of the 4-subset table
+    looked up through 'rows'. Each group holds the lowest node the groups before it leave, so
+    every partition appears exactly once.
+    """
+    full = (1 << 16) - 1
+    table = np.empty((PARTITIONS, 4), dtype=np.int16)
+    p = 0
+
+    for first in lowestGroups(full):
+        rest = full & ~first
+
+        for second in lowestGroups(rest):
+            last = rest & ~second
+
+            for third in lowestGroups(last):
+                table[p, 0] = rows[first]
+                table[p, 1] = rows[second]
+                table[p, 2] = rows[third]
+                table[p, 3] = rows[last & ~third]
+                p += 1
+
+    return table
+
+
+@jit(cache=True)
+def splitTable(rest, rows):
+    """
+    Enumerate every split of the 4, 8 or 12 nodes in 'rest' into groups of four, like partitionTable.
+    """
+    n = popcount(rest) // 4
+    count = 1
+
+    for m in range(1, n + 1):
+        count *= (4 * m - 1) * (4 * m - 2) * (4 * m - 3) // 6
+
+    table = np.empty((count, n), dtype=np.int64)
+
+    if n == 1:
+        table[0, 0] = rows[rest]
+        return table
+
+    p = 0
+
+    for first in lowestGroups(rest):
+        left = rest & ~first
+
+        if n == 2:
+            table[p, 0] = rows[first]
+            table[p, 1] = rows[left]
+            p += 1
+            continue
+
+        for second in lowestGroups(left):
+            table[p, 0] = rows[first]
+            table[p, 1] = rows[second]
+            table[p, 2] = rows[left & ~second]
+            p += 1
+
+    return table
+
+
+@functools.lru_cache(maxsize=None)
+def groupRows():
+    """
+    Return the row in the 4-subset table of every 16-bit mask, -1 for masks of other sizes.
+    """
+    masks4 = toMasks(combinations(range(16), 4))
+    rows = np.full(1 << 16, -1, dtype=np.int64)
+    rows[masks4] = np.arange(len(masks4))
+    rows.setflags(write=False)
+    return rows
+
+
+@functools.lru_cache(maxsize=None)
+def partitions():
+    """
+    Return the table of every partition of a board into four groups, built once per process.
+    """
+    table = partitionTable(groupRows())
+    table.setflags(write=False)
+    return table
+
+
+@jit(cache=True)
+def consistent(table, p, allowed, hits, need):
+    """
+    Check that every group of a partition is allowed and that, together with 'need' already
+    covered or not, its groups share 3 nodes with every one away guess.
+    """
+    got = 0
+
+    for k in range(table.shape[1]):
+        if not allowed[table[p, k]]:
+            return False
+        got |= hits[table[p, k]]
+
+    return (got & need) == need
+
+
+@jit(cache=True)
+def ahead(total, p, other, q):
+    """
+    Whether partition p with 'total' ranks ahead of partition q with 'other': ties go to the lowest.
+    """
+    return total > other or (total == other and p < q)
+
+
+@jit(cache=True)
+def keepPartition(totals, pool, count, total, p):
+    """
+    Add a partition to the heap of the best ones found so far, whose root is the worst of them,
+    replacing the root once the heap is full. Returns the new size of the heap.
+    """
+    size = len(pool)
+
+    if count < size:
+        i = count
+        count += 1
+
+        while i > 0 and ahead(totals[(i - 1) // 2], pool[(i - 1) // 2], total, p):
+            totals[i] = totals[(i - 1) // 2]
+            pool[i] = pool[(i - 1) // 2]
+            i = (i - 1) // 2
+
+    else:
+        i = 0
+
+        while 2 * i + 1 < size:
+            worse = 2 * i + 1
+
+            if worse + 1 < size and ahead(totals[worse], pool[worse], totals[worse + 1], pool[worse + 1]):
+                worse += 1
+
+            if not ahead(total, p, totals[worse], pool[worse]):
+                break
+
+            totals[i] = totals[worse]
+            pool[i] = pool[worse]
+            i = worse
+
+    totals[i] = total
+    pool[i] = p
+
+    return count
+
+
+@jit(cache=True)
+def topPartitions(table, scores, masks4, allowed, hits, need, totals, pool):
+    """
+    Score the consistent partitions of the table as the sum of their group scores, keeping the best
+    len(pool) of them in 'pool', best first, with their scores in 'totals'. Returns how many were kept.
+    The table runs in blocks sharing their first group, made of runs of 35 sharing their second, so
+    the best split of the 8 nodes left by each run bounds its partitions, and the best run of each
+    block bounds the block. Blocks and runs that cannot beat the worst partition kept are skipped.
+    """
+    size = len(pool)
+    full = (1 << 16) - 1
+    blocks = len(table) // 5775
+    # Bounds sum in another order than totals do, so they get slack for the difference in rounding.
+    slack = 1e-9
+    pairs = np.full(1 << 16, np.nan)
+    bounds = np.full(blocks, -np.inf)
+
+    for block in range(blocks):
+        first = table[block * 5775, 0]
+
+        if not allowed[first]:
+            continue
+
+        for run in range(block * 5775, (block + 1) * 5775, 35):
+            second = table[run, 1]
+
+            if not allowed[second]:
+                continue
+
+            rest = full & ~masks4[first] & ~masks4[second]
+
+            if np.isnan(pairs[rest]):
+                pairs[rest] = -np.inf
+
+                for p in range(run, run + 35):
+                    if allowed[table[p, 2]] and allowed[table[p, 3]]:
+                        pairs[rest] = max(pairs[rest], scores[table[p, 2]] + scores[table[p, 3]])
+
+            bounds[block] = max(bounds[block], scores[first] + scores[second] + pairs[rest])
+
+    count = 0
+
+    for block in np.argsort(-bounds):
+        if bounds[block] == -np.inf or (count == size and bounds[block] + slack < totals[0]):
+            break
+
+        first = table[block * 5775, 0]
+
+        for run in range(block * 5775, (block + 1) * 5775, 35):
+            second = table[run, 1]
+
+            if not allowed[second]:
+                continue
+
+            bound = scores[first] + scores[second] + pairs[full & ~masks4[first] & ~masks4[second]]
+
+            if count == size and bound + slack < totals[0]:
+                continue
+
+            for p in range(run, run + 35):
+                total = scores[table[p, 0]] + scores[table[p, 1]] + scores[table[p, 2]] + scores[table[p, 3]]
+
+                if count == size and not ahead(total, p, totals[0], pool[0]):
+                    continue
+
+                if consistent(table, p, allowed, hits, need):
+                    count = keepPartition(totals, pool, count, total, p)
+
+    order = np.argsort(pool[:count], kind="mergesort")
+    kept, scored = pool[:count][order], totals[:count][order]
+    order = np.argsort(-scored, kind="mergesort")
+    pool[:count] = kept[order]
+    totals[:count] = scored[order]
+
+    return count
+
+
+@jit(cache=True)
+def partitionKernel(adjs, weights, combos4, masks4, rows, table, groups, totals, pool):
+    """
+    Play one game by partitions: guess the best group of the best partition still consistent with
+    every answer so far. Incorrect guesses rule out groups sharing 3 or more nodes with them, one away
+    guesses rule out themselves and partitions without a group sharing exactly 3. Until a group is
+    solved, partitions come from the POOL best of the partition table, ranked again only once every
+    one of those is ruled out; after, the nodes left are split anew and rescored for what is left.
+    The answer always stays consistent and every wrong guess rules out the partition it came from,
+    so the game always ends. Takes the game's (models, 16, 16) adjacency stack and (models, 2)
+    weights, and returns the number of turns taken.
+    """
+    inside, spill, density = calcTables(combos4, adjs)
+    scores = np.empty(len(masks4))
+    allowed = np.ones(len(masks4), dtype=np.bool_)
+    # Bit i of hits marks the groups sharing exactly 3 nodes with the ith one away guess.
+    hits = np.zeros(len(masks4), dtype=np.int64)
+    need = 0
+    aways = 0
+    avail = np.ones(adjs.shape[1], dtype=np.bool_)
+    full = (1 << adjs.shape[1]) - 1
+    availMask = full
+    chosen = np.empty(4, dtype=np.int64)
+    split = np.empty((0, 4), dtype=np.int64)
+    turns = 0
+
+    scoreKernel(inside, spill, density, avail, weights, scores)
+    count = topPartitions(table, scores, masks4, allowed, hits, need, totals, pool)
+    start = 0
+
+    while availMask != 0:
+        if availMask == full:
+            best = -1
+
+            while best == -1:
+                for i in range(start, count):
+                    if consistent(table, pool[i], allowed, hits, need):
+                        best = pool[i]
+                        break
+                    if i == start:
+                        start += 1
+
+                if best == -1:
+                    count = topPartitions(table, scores, masks4, allowed, hits, need, totals, pool)
+                    start = 0
+
+            size = 4
+            for k in range(4):
+                chosen[k] = table[best, k]
+
+        else:
+            best = -1
+            top = 0.0
+
+            for i in range(len(split)):
+                if not consistent(split, i, allowed, hits, need):
+                    continue
+
+                total = 0.0
+                for k in range(split.shape[1]):
+                    total += scores[split[i, k]]
+
+                if best == -1 or total > top:
+                    best = i
+                    top = total
+
+            size = split.shape[1]
+            for k in range(size):
+                chosen[k] = split[best, k]
+
+        row = chosen[0]
+
+        for k in range(1, size):
+            if scores[chosen[k]] > scores[row]:
+                row = chosen[k]
+
+        curr = masks4[row]
+        out = checkMask(curr, groups)
+        turns += 1
+
+        if out == 1:
+            availMask &= ~curr
+
+            for j in range(len(avail)):
+                if (curr >> j) & 1:
+                    avail[j] = False
+
+            # Every split left goes with the solved group, so the one away guesses it covers are met.
+            need &= ~hits[row]
+            scoreKernel(inside, spill, density, avail, weights, scores)
+
+            if availMask != 0:
+                split = splitTable(availMask, rows)
+
+        elif out == 0:
+            allowed[row] = False
+
+            # Past 63 one away guesses their partitions are only ruled out by the guesses themselves.
+            if aways < 63:
+                for r in range(len(masks4)):
+                    if popcount(masks4[r] & curr) == 3:
+                        hits[r] |= 1 << aways
+
+                need |= 1 << aways
+                aways += 1
 
         else:
-            adj = purge(adj, curr)
-            avail = list(set(avail) - set(curr))
+            for r in range(len(masks4)):
+                if popcount(masks4[r] & curr) >= 3:
+                    allowed[r] = False
 
     return turns - 4
 
+
+@jit(parallel=True, cache=True)
+def partitionBatch(tensor, games, weights, combos4, masks4, rows, table, groups):
+    """
+    Run partitionKernel on many games of a (models, N, 16, 16) tensor in parallel.
+    """
+    turns = np.empty(len(games), dtype=np.int64)
+
+    for g in prange(len(games)):
+        totals = np.empty(POOL)
+        pool = np.empty(POOL, dtype=np.int64)
+        turns[g] = partitionKernel(tensor[:, games[g]], weights, combos4, masks4, rows, table, groups, totals, pool)
+
+    return turns
+
+
+def partitionAll(games, word_data, weights):
+    """
+    Play many games at once by partitions, returning the number of turns of each.
+    """
+    games = np.asarray(games, dtype=np.int64)
+
+    if not any(weights):
+        return np.full(len(games), 99, dtype=np.int64)
+
+    store = GameStore.open(word_data)
+    combos4 = combinations(range(16), 4)
+    groups = np.array([toMask(range(g, g + 4)) for g in range(0, 16, 4)], dtype=np.int64)
+
+    return partitionBatch(
+        store.tensor,
+        games,
+        np.array(weights, dtype=np.float64).reshape(store.models, 2),
+        combos4,
+        toMasks(combos4),
+        groupRows(),
+        partitions(),
+        groups,
+    )
+
+
+def warmup():
+    """
+    Compile (or load from the on-disk cache) every kernel for the types play uses, on a dummy game.
+    Meant as a pool initializer, so workers pay for it before their first task instead of during it.
+    """
+    adj = np.eye(16, dtype=np.float32)
+    adj.setflags(write=False)
+    table = ScoreTable(adj, sizes=(3,))
+    RankedCandidates(Candidates(adj, table.available(), (1.0, 1.0), 4)).top(1)
+    combos4 = combinations(range(16), 4)
+    combos3 = combinations(range(16), 3)
+    groups = np.array([toMask(range(g, g + 4)) for g in range(0, 16, 4)], dtype=np.int64)
+    playBatch(adj[None, None], np.zeros(1, dtype=np.int64), np.ones((1, 2)), combos4, toMasks(combos4), combos3, toMasks(combos3), groups)
+    # No games, so the partition kernels compile without the partition table having to be built.
+    split = np.zeros((0, 4), dtype=np.int16)
+    split.setflags(write=False)
+    partitionBatch(
+        adj[None, None], np.zeros(0, dtype=np.int64), np.ones((1, 2)), combos4, toMasks(combos4), groupRows(), split, groups
+    )
+
+
+def evaluate(population, games, word_data, backend="features"):
+    """
+    Play every game in 'games' with every weight vector of 'population', two weights per model
+    of word_data (see combine), returning an (n_weights, n_games) matrix of the number of turns taken. The "features" backend replays
+    the games from the feature cache, "play" plays them (and so records them while instrumented).
+    """
+    # feature_store builds on this module, so it can only be imported once this module is loaded.
+    from feature_store import load, replayAll
+
+    population = np.atleast_2d(np.asarray(population, dtype=np.float64))
+    turns = np.empty((len(population), len(games)), dtype=np.int64)
+
+    if backend == "play":
+        for w, weights in enumerate(population.tolist()):
+            turns[w] = [play(n, word_data, tuple(weights)) for n in games]
+
+        return turns
+
+    features = load(word_data)
+
+    for i, n in enumerate(games):
+        turns[:, i] = replayAll(features, n, population)
+
+    return turns
+
+@jit(cache=True)
+def solveKernel(adjs, weights, combos4, masks4, guesses, scores):
+    """
+    Solve one new board from its (models, 16, 16) adjacency stack in nopython mode, each turn guessing
+    the best group left, into the rows of 'guesses'. The scores of every group of the full board are
+    left in 'scores'.
+    """
+    inside, spill, density = calcTables(combos4, adjs)
+    current = np.empty(len(masks4))
+    taken = np.zeros(len(masks4), dtype=np.bool_)
+    avail = np.ones(adjs.shape[1], dtype=np.bool_)
+    availMask = (1 << adjs.shape[1]) - 1
+    scoreKernel(inside, spill, density, avail, weights, scores)
+    current[:] = scores
+
+    for turn in range(len(guesses)):
+        row = bestKernel(current, masks4, availMask, 0, taken)
+        guesses[turn] = combos4[row]
+        availMask &= ~masks4[row]
+
+        for j in range(len(avail)):
+            if (masks4[row] >> j) & 1:
+                avail[j] = False
+
+        scoreKernel(inside, spill, density, avail, weights, current)
+
+
+@jit(parallel=True, cache=True)
+def solveBatch(tensor, weights, combos4, masks4):
+    """
+    Run solveKernel on every board of a (models, N, 16, 16) tensor in parallel.
+    """
+    guesses = np.empty((tensor.shape[1], tensor.shape[2] // 4, 4), dtype=np.int64)
+    scores = np.empty((tensor.shape[1], len(masks4)))
+
+    for b in prange(tensor.shape[1]):
+        solveKernel(tensor[:, b], weights, combos4, masks4, guesses[b], scores[b])
+
+    return guesses, scores
+
+
+def solveAll(tensor, weights):
+    """
+    Solve many new boards of a (models, N, 16, 16) adjacency tensor at once, guessing the best group
+    left each turn (ties broken by the lowest group, as genPq does). Returns the (N, 4, 4) groups in
+    the order they are guessed, and the (N, n_combos) scores of every group of the full boards, in
+    combinations order.
+    """
+    combos4 = combinations(range(16), 4)
+
+    return solveBatch(tensor, np.array(weights, dtype=np.float64).reshape(len(tensor), 2), combos4, toMasks(combos4))
+
+
+def solve(words, weights=None, word_data="fasttext"):
+    """
+    Solve a new puzzle from its 16 words, using the compact embedding table of a data model instead
+    of the full model. Returns the four groups of words in the order the AI would guess them.
+    """
+    adj = EmbeddingStore.open(word_data).adjacency(words)
+    guesses, _ = solveAll(adj[None, None], WEIGHTS if weights is None else weights)
+
+    return [[words[i] for i in group] for group in guesses[0].tolist()]
+
+
 WEIGHTS = (0.70196533203125, 0.05657958984375)
 
+# Bump whenever a change to the solver changes the turns it takes, so cached outcomes are recomputed.
+VERSION = 2
+
 #print(play(189, "fasttext", WEIGHTS))
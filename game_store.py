@@ -0,0 +1,143 @@
+"""
+Keeps every game of a data model in one contiguous (N, 16, 16) float32 adjacency array, with the words
+alongside it, memory-mapped once per process. The store of an ensemble of models holds a
+(models, N, 16, 16) tensor instead, one adjacency per model of every game. Every game is stored with
+its four answer groups in order, nodes 0-3, 4-7, 8-11 and 12-15, which is what check relies on.
+"""
+
+import os
+import numpy as np
+from multiprocessing import shared_memory
+
+
+def share(arrays):
+    """
+    Copy named arrays into shared memory. Returns the blocks, which the caller keeps alive and
+    unlinks when done, and a picklable spec that other processes pass to 'attach'.
+    """
+    blocks = []
+    spec = {}
+
+    for name, array in arrays.items():
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        blocks.append(block)
+        spec[name] = (block.name, array.shape, array.dtype.str)
+
+    return blocks, spec
+
+
+def attach(spec):
+    """
+    Attach to arrays placed in shared memory by 'share', returning the blocks (to keep alive)
+    and read-only views of the arrays.
+    """
+    blocks = []
+    arrays = {}
+
+    for name, (block, shape, dtype) in spec.items():
+        block = shared_memory.SharedMemory(name=block)
+        array = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        array.setflags(write=False)
+        blocks.append(block)
+        arrays[name] = array
+
+    return blocks, arrays
+
+
+class GameStore:
+    """
+    Memory-mapped games of a data model. Indexing the store returns a zero-copy view of one game's adjacency,
+    or of an ensemble's (models, 16, 16) stack of them. 'tensor' is the adjacency with a leading model
+    axis either way.
+    """
+
+    FILES = ("adjacency.npy",)
+    _open = {}
+
+    def __init__(self, word_data, adj, words):
+        self.word_data = word_data
+        self.adj = adj
+        self.tensor = adj if adj.ndim == 4 else adj[None]
+        self.models = len(self.tensor)
+        self.words = words
+        self.blocks = []
+
+    def __len__(self):
+        return self.tensor.shape[1]
+
+    def __getitem__(self, n):
+        return self.adj[n] if self.adj.ndim == 3 else self.tensor[:, n]
+
+    @staticmethod
+    def stale(word_data):
+        """
+        Check whether the store of a data model is missing or older than its data.npy.
+        """
+        source = os.path.getmtime(word_data + "/data.npy")
+
+        for name in GameStore.FILES:
+            target = word_data + "/" + name
+            if not os.path.exists(target) or os.path.getmtime(target) < source:
+                return True
+
+        return False
+
+    @staticmethod
+    def build(word_data):
+        """
+        Convert the data.npy archive written by extract into the store's contiguous float32 layout.
+        The file is written to a temporary file and swapped into place, so processes opening a stale
+        store at the same time never read it half-written.
+        """
+        archive = np.load(word_data + "/data.npy", allow_pickle=True)
+        adj = np.ascontiguousarray(np.stack(list(archive)), dtype=np.float32)
+        target = word_data + "/adjacency.npy"
+        temp = "%s.%d.tmp" % (target, os.getpid())
+
+        with open(temp, "wb") as file:
+            np.save(file, adj)
+
+        os.replace(temp, target)
+
+    @classmethod
+    def load(cls, word_data):
+        """
+        Memory-map the store files of a data model.
+        """
+        return cls(
+            word_data,
+            np.load(word_data + "/adjacency.npy", mmap_mode="r"),
+            np.load(word_data + "/word_data.npy", mmap_mode="r"),
+        )
+
+    def share(self):
+        """
+        Place the store in shared memory, returning the blocks and the spec for 'attach'.
+        """
+        return share({"adj": self.adj, "words": self.words})
+
+    @classmethod
+    def attach(cls, word_data, spec):
+        """
+        Open a store placed in shared memory by another process as this process's store of word_data.
+        """
+        blocks, arrays = attach(spec)
+        store = cls(word_data, arrays["adj"], arrays["words"])
+        store.blocks = blocks
+        cls._open[word_data] = store
+
+        return store
+
+    @classmethod
+    def open(cls, word_data):
+        """
+        Return the store of a data model, building it first if needed. Each store is opened once per process.
+        """
+        if word_data not in cls._open:
+            if cls.stale(word_data):
+                cls.build(word_data)
+
+            cls._open[word_data] = cls.load(word_data)
+
+        return cls._open[word_data]
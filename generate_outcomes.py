@@ -3,35 +3,162 @@ Generates the outcomes used to evaluate algorithms, as well as the data used for
 
 """
 
-from game_master import play
+from feature_store import load, replay
+from game_master import WEIGHTS, partitionAll, play, playAll, warmup
+from game_store import GameStore, share, attach
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
-import matplotlib.pyplot as plt
+import outcome_cache
+import solver_stats
 import statistics
+import functools
+import math
+import multiprocessing
 
 DATA_MODEL = "fasttext"
-SIZE = len(np.load(DATA_MODEL + "/data.npy", allow_pickle=True))
+
+
+def __getattr__(name):
+    """
+    Open the store for SIZE on first use instead of at import.
+    """
+    if name == "SIZE":
+        return len(GameStore.open(DATA_MODEL))
+    raise AttributeError(name)
 
 cheat = []
 
 
-def create_outcomes(SIZE, DATA_MODEL, weights):
+WORKER = {}
+
+
+def init_worker(DATA_MODEL, store_spec, feature_spec):
+    """
+    Attach a pool worker to the games and features its parent placed in shared memory.
+    The features are only shared, and 'feature_spec' only set, for the backends that read them.
+    """
+    GameStore.attach(DATA_MODEL, store_spec)
+    WORKER["blocks"], WORKER["features"] = attach(feature_spec) if feature_spec is not None else ([], None)
+    warmup()
+
+
+def simulate(games, DATA_MODEL, weights, features=None, backend="features", strategy="greedy"):
+    """
+    Simulate the given games with one of the solver backends: "features" replays them from
+    the cached features, "kernel" runs the compiled play kernel across them in parallel,
+    "play" plays them one by one, recording them while solver_stats is enabled.
+    The "partition" strategy only has a compiled kernel, which it runs whatever the backend.
+    """
+    if strategy == "partition":
+        return partitionAll(games, DATA_MODEL, weights).tolist()
+
+    if backend == "kernel":
+        return playAll(games, DATA_MODEL, weights).tolist()
+
+    if backend == "play":
+        return [play(i, DATA_MODEL, weights) for i in games]
+
+    if features is None:
+        features = load(DATA_MODEL)
+
+    return [replay(features, i, weights) for i in games]
+
+
+def outcomes_chunk(games, DATA_MODEL, weights, backend, instrument=False, strategy="greedy"):
+    """
+    Simulate a chunk of games inside a pool worker, returning the outcomes and, with 'instrument',
+    the solver_stats records of the games played.
+    """
+    if instrument:
+        return solver_stats.collect(simulate, games, DATA_MODEL, weights, WORKER["features"], backend, strategy)
+
+    return simulate(games, DATA_MODEL, weights, WORKER["features"], backend, strategy), []
+
+
+def create_outcomes(SIZE, DATA_MODEL, weights, workers=None, chunksize=None, backend="features", strategy="greedy"):
     """
     Simulate the game for a given number of iterations (SIZE) and store the outcomes.
-    Saves the results to a .npy file.
+    With 'workers', the games are split into chunks of 'chunksize' across a process pool that
+    shares the games and their features through shared memory; outcomes stay in game order.
+    Outcomes are served from, and saved to, the outcome cache, except while solver_stats is
+    recording, when the games are always simulated. 'strategy' is passed on to play (see play).
     """
-    data = []
-    for i in range(SIZE):
-        data.append(play(i, DATA_MODEL, weights))
-        print(str(i) + ":" + str(data[i]))
+    data = None if solver_stats.STATS is not None else outcome_cache.get(DATA_MODEL, weights, SIZE, strategy)
+
+    if data is not None:
+        data = data.tolist()
+
+    elif workers is not None:
+        data = create_outcomes_parallel(SIZE, DATA_MODEL, weights, workers, chunksize, backend, strategy)
+        outcome_cache.put(DATA_MODEL, weights, data, strategy)
+
+    else:
+        data = simulate(range(SIZE), DATA_MODEL, weights, backend=backend, strategy=strategy)
+        outcome_cache.put(DATA_MODEL, weights, data, strategy)
+
+    if workers is None:
+        for i in range(SIZE):
+            print(str(i) + ":" + str(data[i]))
 
     return data
 
 
-def load_outcomes(DATA_MODEL):
+def create_outcomes_parallel(SIZE, DATA_MODEL, weights, workers, chunksize=None, backend="features", strategy="greedy"):
+    """
+    Simulate the games across a pool of 'workers' processes, returning the outcomes in game order.
+    While solver_stats is enabled, the records of the games played by the workers are merged into it.
+    """
+    if chunksize is None:
+        chunksize = max(1, math.ceil(SIZE / (workers * 4)))
+
+    chunks = [range(i, min(i + chunksize, SIZE)) for i in range(0, SIZE, chunksize)]
+    store_blocks, store_spec = GameStore.open(DATA_MODEL).share()
+    feature_blocks, feature_spec = [], None
+
+    if backend == "features" and strategy != "partition":
+        feature_blocks, feature_spec = share(load(DATA_MODEL))
+
+    try:
+        with ProcessPoolExecutor(
+            workers,
+            mp_context=multiprocessing.get_context("forkserver"),
+            initializer=init_worker,
+            initargs=(DATA_MODEL, store_spec, feature_spec),
+        ) as pool:
+            results = list(pool.map(
+                functools.partial(
+                    outcomes_chunk,
+                    DATA_MODEL=DATA_MODEL,
+                    weights=weights,
+                    backend=backend,
+                    instrument=solver_stats.STATS is not None,
+                    strategy=strategy,
+                ),
+                chunks,
+            ))
+
+            for chunk, records in results:
+                if solver_stats.STATS is not None:
+                    solver_stats.STATS.merge(records)
+
+            return [outcome for chunk, records in results for outcome in chunk]
+
+    finally:
+        for block in store_blocks + feature_blocks:
+            block.close()
+            block.unlink()
+
+
+def load_outcomes(DATA_MODEL, weights=WEIGHTS):
     """
-    Load the outcomes data from a previously saved .npy file.
+    Load the outcomes of every game for a weight vector from the outcome cache.
     """
-    return np.load(DATA_MODEL + "_outcomes.npy")
+    data = outcome_cache.lookup(DATA_MODEL, weights)
+
+    if data is None:
+        raise FileNotFoundError("no cached outcomes of %s for %s" % (DATA_MODEL, (weights,)))
+
+    return data
 
 
 def graph(data):
@@ -39,6 +166,8 @@ def graph(data):
     Generate and display a histogram of the outcomes data.
     The histogram shows the frequency of different outcome values.
     """
+    import matplotlib.pyplot as plt
+
     min_val = min(data)
     max_val = max(data)
     bins = np.arange(min_val, max_val + 2)
@@ -64,18 +193,26 @@ def graph(data):
 
 
 def analyze(numbers):
-    count_under_4 = sum(1 for num in numbers if num < 4)
-    mean = statistics.mean(numbers)
+    """
+    Score outcomes by how many are under 4, tie-broken by their mean.
+    Accepts a single list of outcomes, or an (n_weights, n_games) matrix scored row by row.
+    """
+    numbers = np.asarray(numbers)
+    count_under_4 = (numbers < 4).sum(axis=-1)
+    mean = numbers.mean(axis=-1)
     return count_under_4 + (1 - (mean * 0.01))
 
 
-def analyze_full(numbers):
+def analyze_full(numbers=None, weights=WEIGHTS):
     """
-    Analyze the data to calculate:
+    Analyze the outcomes, or when none are given the outcomes of every game for 'weights', to calculate:
     - The mean value of the outcomes.
     - The mode (most frequent) value of the outcomes.
     - The number and percentage of outcomes that are less than 4.
     """
+    if numbers is None:
+        numbers = create_outcomes(len(GameStore.open(DATA_MODEL)), DATA_MODEL, weights)
+
     count_under_4 = sum(1 for num in numbers if num < 4)
     mean = statistics.mean(numbers)
     mode = statistics.mode(numbers)
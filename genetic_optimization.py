@@ -3,20 +3,169 @@ Performs a genetic algorithm to find the optimal weights.
 """
 
 import numpy as np
+import functools
+import math
+import sys
+import outcome_cache
+import solver_stats
 from numpy.random import randint
 from numpy.random import rand
 from generate_outcomes import analyze, create_outcomes
-from loky import get_reusable_executor
+from game_master import evaluate, warmup
+from game_store import GameStore
 
 DATA_MODEL = "fasttext"
-SIZE = len(np.load(DATA_MODEL + "/data.npy", allow_pickle=True))
-executor = get_reusable_executor(max_workers=4)
+
+# A work_queue.Dispatcher to play games on instead of the local executor, when set.
+DISPATCHER = None
+
+def size():
+    """
+    Number of games in the data model, opening its store on first use.
+    """
+    return len(GameStore.open(DATA_MODEL))
+
+def get_executor():
+    """
+    Returns the reusable loky executor, starting its workers with warm kernels on first use.
+    """
+    from loky import get_reusable_executor
+
+    return get_reusable_executor(max_workers=4, initializer=warmup)
 
 def objective(x):
     """
     Evaluates the outcome of a decoded bitstring.
     """
-    return analyze(create_outcomes(SIZE, DATA_MODEL, (x[0], x[1])))
+    if DISPATCHER is not None:
+        return population_objective([x])[0]
+    return analyze(create_outcomes(size(), DATA_MODEL, tuple(x)))
+
+def play_games(decoded, games, n_chunks=4):
+    """
+    Plays the given games with every decoded bitstring, splitting the games across the executor,
+    or across the workers of the dispatcher when there is one. While solver_stats is enabled, the
+    games are played rather than replayed, and the workers' records are merged into it.
+    """
+    if DISPATCHER is not None:
+        return DISPATCHER.evaluate(decoded, games, DATA_MODEL)
+
+    chunks = [chunk for chunk in np.array_split(np.asarray(games), n_chunks) if len(chunk)]
+
+    if solver_stats.STATS is not None:
+        task = functools.partial(solver_stats.collect, evaluate, decoded, word_data=DATA_MODEL, backend="play")
+        played = list(get_executor().map(task, chunks))
+
+        for turns, records in played:
+            solver_stats.STATS.merge(records)
+
+        return np.concatenate([turns for turns, records in played], axis=1)
+
+    played = get_executor().map(functools.partial(evaluate, decoded, word_data=DATA_MODEL), chunks)
+    return np.concatenate(list(played), axis=1)
+
+def population_objective(decoded, n_chunks=4):
+    """
+    Evaluates every decoded bitstring of a population at once, splitting the games across the executor.
+    Only weights missing from the outcome cache are played, each distinct vector once.
+    """
+    turns = [outcome_cache.get(DATA_MODEL, x, size()) for x in decoded]
+    missing = list(dict.fromkeys(tuple(x) for x, t in zip(decoded, turns) if t is None))
+
+    if missing:
+        for x, row in zip(missing, play_games(missing, np.arange(size()), n_chunks)):
+            outcome_cache.put(DATA_MODEL, x, row)
+
+        turns = [outcome_cache.get(DATA_MODEL, x, size()) for x in decoded]
+
+    return analyze(np.array(turns)).tolist()
+
+def gains(turns, n):
+    """
+    Splits the objective into per-game terms, so that on all n games it is their sum plus one.
+    """
+    return (turns < 4) - (turns * 0.01 / n)
+
+def race(decoded, first=32, eta=2, z=2.0, n_chunks=4):
+    """
+    Races a population on growing random subsets of the games. After each rung, candidates whose score
+    is statistically behind the leader's on the same games (a paired z-test) are dropped. Of the rest,
+    at most 1/eta of the population go on to a rung eta times larger; the others wait at their rung
+    until those ahead are done, and are then tested against them again before racing on. So only the
+    z-test drops candidates, and every other candidate is played on every game.
+    A dropped candidate is scored as the leader it was dropped against, plus its mean paired difference
+    from that leader on the games they both played, so every score is on the scale of the exact scores.
+    Returns every candidate's score and whether it is exact.
+    """
+    n = size()
+    unique = list(dict.fromkeys(tuple(x) for x in decoded))
+    order = np.random.permutation(n)
+    turns = np.zeros((len(unique), n), dtype=np.int64)
+    seen = np.zeros(len(unique), dtype=np.int64)
+
+    for i, x in enumerate(unique):
+        cached = outcome_cache.get(DATA_MODEL, x, n)
+        if cached is not None:
+            turns[i], seen[i] = cached, n
+
+    alive = np.flatnonzero(seen < n)
+    rung = min(first, n)
+    cap = max(1, math.ceil(len(alive) / eta))
+    anchors = {}
+    waiting = []
+
+    while len(alive):
+        games = order[seen[alive[0]]:rung]
+
+        if len(games):
+            turns[np.ix_(alive, games)] = play_games([unique[i] for i in alive], games, n_chunks)
+            seen[alive] = rung
+
+        if rung == n:
+            alive = waiting.pop() if waiting else []
+            rung = seen[alive[0]] if len(alive) else n
+            continue
+
+        racing = np.array([i for i in np.flatnonzero(seen >= rung) if i not in anchors])
+        paired = gains(turns[np.ix_(racing, order[:rung])], n)
+        estimate = paired.mean(axis=1)
+        leader = np.argmax(estimate)
+        diff = paired - paired[leader]
+        behind = diff.mean(axis=1) + (z * diff.std(axis=1, ddof=1) / np.sqrt(rung)) < 0
+
+        for i in np.flatnonzero(behind):
+            if racing[i] in alive:
+                anchors[racing[i]] = (racing[leader], n * diff[i].mean())
+
+        contenders = [racing[i] for i in np.argsort(-estimate, kind="stable") if not behind[i] and racing[i] in alive]
+
+        if len(contenders) > cap:
+            waiting.append(np.sort(contenders[cap:]))
+
+        alive = np.sort(contenders[:cap])
+        rung = min(rung * eta, n)
+
+        if not len(alive) and waiting:
+            alive = waiting.pop()
+            rung = seen[alive[0]]
+
+    scores = {}
+
+    def score(i):
+        # Every chain of leaders ends at a candidate played on every game.
+        if i not in scores:
+            if seen[i] == n:
+                scores[i] = float(analyze(turns[i]))
+                outcome_cache.put(DATA_MODEL, unique[i], turns[i])
+            else:
+                leader, difference = anchors[i]
+                scores[i] = score(leader) + difference
+
+        return scores[i]
+
+    index = {x: i for i, x in enumerate(unique)}
+
+    return [score(index[tuple(x)]) for x in decoded], [bool(seen[index[tuple(x)]] == n) for x in decoded]
 
 def decode(bounds, n_bits, bitstring):
     """
@@ -68,9 +217,11 @@ def mutation(bitstring, r_mut):
         if rand() < r_mut:
             bitstring[i] = 1-bitstring[i]
             
-def genetic_algorithm(bounds, n_bits, n_iter, n_pop, r_cross, r_mut):
+def genetic_algorithm(bounds, n_bits, n_iter, n_pop, r_cross, r_mut, racing=False):
     """
     Runs the genetic algorithm to optimize the objective function.
+    With 'racing', each generation is raced instead of played in full, and only scores confirmed
+    on every game can become the best.
     """
     pop = [randint(0, 2, n_bits*len(bounds)).tolist() for _ in range(n_pop)]
     best, best_eval = 0, objective(decode(bounds, n_bits, pop[0]))
@@ -78,9 +229,12 @@ def genetic_algorithm(bounds, n_bits, n_iter, n_pop, r_cross, r_mut):
     for gen in range(n_iter):
         
         decoded = [decode(bounds, n_bits, p) for p in pop]
-        scores = list(executor.map(objective, decoded, chunksize=16))
+        if racing:
+            scores, exact = race(decoded)
+        else:
+            scores, exact = population_objective(decoded), [True] * n_pop
         for i in range(n_pop):
-            if scores[i] >= best_eval:
+            if exact[i] and scores[i] >= best_eval:
                 best, best_eval = pop[i], scores[i]     
                 print(">%d, new best f(%s) = %f" % (gen, decoded[i], scores[i]))
                 
@@ -95,14 +249,40 @@ def genetic_algorithm(bounds, n_bits, n_iter, n_pop, r_cross, r_mut):
         pop = children
     return [best, best_eval]
 
-bounds = [[0, 1], [0, 1]]
-n_iter = 200
-n_bits = 16
-n_pop = 64
-r_cross = 0.9
-r_mut = 1.0 / (float(n_bits) * len(bounds))
-best, score = genetic_algorithm(bounds, n_bits, n_iter, n_pop, r_cross, r_mut)
-print("DONE")
-
-decoded = decode(bounds, n_bits, best)
-print((decoded, score))
+if __name__ == "__main__":
+    # A conductance and a density weight for each model of the data model.
+    bounds = [[0, 1], [0, 1]] * GameStore.open(DATA_MODEL).models
+    n_iter = 200
+    n_bits = 16
+    n_pop = 64
+    r_cross = 0.9
+    r_mut = 1.0 / (float(n_bits) * len(bounds))
+    racing = "--racing" in sys.argv
+
+    if "--instrument" in sys.argv:
+        solver_stats.enable()
+
+    if "--listen" in sys.argv:
+        import work_queue
+
+        DISPATCHER = work_queue.Dispatcher(work_queue.parse(sys.argv[sys.argv.index("--listen") + 1]))
+
+        if "--local" in sys.argv:
+            local = int(sys.argv[sys.argv.index("--local") + 1])
+            work_queue.spawn(DISPATCHER, local, DATA_MODEL)
+            DISPATCHER.wait(local)
+
+    best, score = genetic_algorithm(bounds, n_bits, n_iter, n_pop, r_cross, r_mut, racing)
+    print("DONE")
+
+    if solver_stats.STATS is not None:
+        print(solver_stats.STATS.summary())
+        solver_stats.STATS.export(DATA_MODEL + "/solver_trace.json")
+
+    if DISPATCHER is not None:
+        for name, stats in DISPATCHER.report().items():
+            print(name, stats)
+        DISPATCHER.close()
+
+    decoded = decode(bounds, n_bits, best)
+    print((decoded, score))
@@ -0,0 +1,117 @@
+"""
+Caches the turns taken on every game for each weight vector, keyed by the content of the data model's
+games, the solver version, the exact weights and the strategy played: an in-memory LRU in front of
+one .npy file per key on disk.
+"""
+
+import collections
+import hashlib
+import os
+import numpy as np
+from game_master import VERSION
+
+SIZE = 4096
+
+memory = collections.OrderedDict()
+hashes = {}
+
+
+def dataset_hash(word_data):
+    """
+    Hash the content of a data model's data.npy, rehashing only when the file changes.
+    """
+    source = word_data + "/data.npy"
+    stat = os.stat(source)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+
+    if hashes.get(word_data, (None,))[0] != stamp:
+        digest = hashlib.sha256()
+
+        with open(source, "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                digest.update(block)
+
+        hashes[word_data] = (stamp, digest.hexdigest())
+
+    return hashes[word_data][1]
+
+
+def key(word_data, weights, strategy="greedy"):
+    """
+    Return the cache key of a weight vector on a data model. Weights are keyed exactly, by their hex form.
+    """
+    name = "%s:%d:%s" % (dataset_hash(word_data), VERSION, ",".join(float(w).hex() for w in weights))
+    return name if strategy == "greedy" else name + ":" + strategy
+
+
+def path(word_data, weights, strategy="greedy"):
+    """
+    Return the location of the cached outcomes of a weight vector on disk.
+    """
+    name = key(word_data, weights, strategy)
+    return word_data + "/outcomes/" + hashlib.sha256(name.encode("utf8")).hexdigest()[:32] + ".npy"
+
+
+def lookup(word_data, weights, strategy="greedy"):
+    """
+    Return every cached turn count of a weight vector, or None if it has none.
+    """
+    name = key(word_data, weights, strategy)
+    turns = memory.get(name)
+
+    if turns is not None:
+        memory.move_to_end(name)
+        return turns
+
+    try:
+        turns = np.load(path(word_data, weights, strategy))
+    except (FileNotFoundError, ValueError):
+        return None
+
+    remember(name, turns)
+    return turns
+
+
+def get(word_data, weights, n, strategy="greedy"):
+    """
+    Return the cached turns of the first n games for a weight vector, or None if they are not cached.
+    """
+    turns = lookup(word_data, weights, strategy)
+
+    if turns is None or len(turns) < n:
+        return None
+
+    return turns[:n]
+
+
+def put(word_data, weights, turns, strategy="greedy"):
+    """
+    Cache the turns of the first len(turns) games for a weight vector, unless more of them are already cached.
+    """
+    turns = np.array(turns, dtype=np.int16)
+    cached = lookup(word_data, weights, strategy)
+
+    if cached is not None and len(cached) >= len(turns):
+        return
+
+    target = path(word_data, weights, strategy)
+    temp = "%s.%d.tmp" % (target, os.getpid())
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+
+    with open(temp, "wb") as file:
+        np.save(file, turns)
+
+    os.replace(temp, target)
+    remember(key(word_data, weights, strategy), turns)
+
+
+def remember(name, turns):
+    """
+    Keep outcomes in the in-memory tier, evicting the least recently used beyond SIZE entries.
+    """
+    turns.setflags(write=False)
+    memory[name] = turns
+    memory.move_to_end(name)
+
+    while len(memory) > SIZE:
+        memory.popitem(last=False)
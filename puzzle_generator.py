@@ -0,0 +1,270 @@
+"""
+Generates practice boards and hard test cases from the vocabulary of a data model's embedding table.
+An inverted file index (IVF) over the word vectors finds each word's nearest neighbors by scanning only
+the few k-means lists nearest to it. Groups of four are grown around seed words from their neighbors,
+some seeded from another group's leftover neighbors so they sit close to it as red herrings, and every
+board is scored with the solver's conductance and density criteria. Boards are written as the
+data.npy and word_data.npy of a new data model, which play and the rest of the solver read as is.
+"""
+
+import os
+import sys
+import time
+import numpy as np
+from embedding_store import EmbeddingStore
+from game_master import WEIGHTS, combinations, score, toMask, toMasks
+
+DATA_MODEL = "fasttext"
+# Lists scanned per search, and neighbors considered around each seed.
+PROBE = 8
+NEIGHBORS = 32
+# Chance that a group is seeded from another group's leftover neighbors.
+HERRING = 0.5
+# Practice boards have at most EASY wrong groups scoring above an answer, hard ones at least HARD.
+EASY = 0
+HARD = 1
+
+COMBOS = combinations(range(16), 4)
+ANSWERS = np.flatnonzero(np.isin(toMasks(COMBOS), [toMask(range(g, g + 4)) for g in range(0, 16, 4)]))
+
+
+class IVF:
+    """
+    Inverted file index over the unit vectors of an embedding table: k-means centroids, and the
+    vectors of every list stored contiguously, with 'rows' mapping them back to the table.
+    """
+
+    FILE = "ivf.npz"
+    _open = {}
+
+    def __init__(self, centroids, rows, offsets, vectors):
+        self.centroids = centroids
+        self.rows = rows
+        self.offsets = offsets
+        self.vectors = vectors[rows]
+
+    @staticmethod
+    def train(vectors, lists=None, iterations=8, seed=0):
+        """
+        Cluster unit vectors into 'lists' lists (by default about 4 per square root of their count)
+        with spherical k-means, trained on a sample of them. Returns the centroids, the rows of the
+        vectors ordered by list and the offsets of each list into them.
+        """
+        rng = np.random.default_rng(seed)
+        lists = lists or max(1, int(4 * np.sqrt(len(vectors))))
+        sample = vectors[rng.choice(len(vectors), min(len(vectors), lists * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), lists, replace=False)]
+
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            order = np.argsort(assign, kind="stable")
+            counts = np.bincount(assign, minlength=lists)
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            filled = counts > 0
+
+            centroids[filled] = np.add.reduceat(sample[order], starts[filled])
+            centroids[~filled] = sample[rng.choice(len(sample), int((~filled).sum()))]
+            centroids /= np.linalg.norm(centroids, axis=1, keepdims=True)
+
+        assign = np.concatenate([
+            np.argmax(vectors[i:i + 8192] @ centroids.T, axis=1) for i in range(0, len(vectors), 8192)
+        ])
+        rows = np.argsort(assign, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=lists))])
+
+        return centroids, rows, offsets
+
+    def search(self, query, k, probe=PROBE):
+        """
+        Return the rows of the (about) k nearest vectors to a unit query, nearest first, with their similarities.
+        """
+        lists = np.argsort(-(self.centroids @ query))[:probe]
+        rows = np.concatenate([self.rows[self.offsets[l]:self.offsets[l + 1]] for l in lists])
+        sims = np.concatenate([self.vectors[self.offsets[l]:self.offsets[l + 1]] @ query for l in lists])
+        top = np.argsort(-sims)[:k]
+
+        return rows[top], sims[top]
+
+    @staticmethod
+    def stale(word_data):
+        """
+        Check whether the index of a data model is missing or older than its embedding table.
+        """
+        target = word_data + "/" + IVF.FILE
+        return not os.path.exists(target) or os.path.getmtime(target) < os.path.getmtime(word_data + "/embeddings.npy")
+
+    @classmethod
+    def open(cls, word_data):
+        """
+        Return the index of a data model's embedding table, training and saving it first if needed.
+        Each index is opened once per process.
+        """
+        if word_data not in cls._open:
+            vectors = np.asarray(EmbeddingStore.open(word_data).vectors, dtype=np.float32)
+
+            if cls.stale(word_data):
+                centroids, rows, offsets = cls.train(vectors)
+                np.savez(word_data + "/" + cls.FILE, centroids=centroids, rows=rows, offsets=offsets)
+
+            with np.load(word_data + "/" + cls.FILE) as saved:
+                cls._open[word_data] = cls(saved["centroids"], saved["rows"], saved["offsets"], vectors)
+
+        return cls._open[word_data]
+
+
+class Generator:
+    """
+    Makes boards of four groups of four words from a data model's vocabulary. Only alphabetic words
+    of 3 letters or more are used, and no word on a board is a prefix of another, which keeps out
+    plurals and other forms of the same word.
+    """
+
+    def __init__(self, word_data=DATA_MODEL, weights=WEIGHTS, seed=None):
+        store = EmbeddingStore.open(word_data)
+        self.index = IVF.open(word_data)
+        self.words = store.vocab.tolist()
+        self.vectors = np.asarray(store.vectors, dtype=np.float32)
+        self.usable = np.array([word.isalpha() and len(word) >= 3 for word in self.words])
+        self.seeds = np.flatnonzero(self.usable)
+        self.weights = weights
+        self.rng = np.random.default_rng(seed)
+
+    def fits(self, row, board):
+        """
+        Check whether a word can join the words already on a board.
+        """
+        word = self.words[row]
+        return self.usable[row] and not any(word.startswith(other) or other.startswith(word) for other in board)
+
+    def group(self, seed, board):
+        """
+        Grow a group of four around a seed word from its nearest neighbors, adding whichever is
+        closest to the words picked so far. Returns the group and the neighbors left over, or None
+        when too few neighbors fit the board.
+        """
+        words = board + [self.words[seed]]
+        rows = [int(row) for row in self.index.search(self.vectors[seed], NEIGHBORS + 1)[0] if row != seed]
+        rows = [row for row in rows if self.fits(row, words)]
+
+        if len(rows) < 3:
+            return None
+
+        sims = self.vectors[rows] @ self.vectors[[seed] + rows].T
+        total = sims[:, 0].copy()
+        picked = []
+
+        while len(picked) < 3:
+            best = int(np.argmax(total))
+
+            if total[best] == -np.inf:
+                return None
+
+            total[best] = -np.inf
+
+            if self.fits(rows[best], words):
+                picked.append(best)
+                words.append(self.words[rows[best]])
+                total += sims[:, best + 1]
+
+        return [seed] + [rows[i] for i in picked], [rows[i] for i in range(len(rows)) if i not in picked]
+
+    def board(self, herring=HERRING, attempts=64):
+        """
+        Propose the 16 rows of a board, its groups in order, or None if it could not be completed.
+        With probability 'herring', a group is seeded from the leftover neighbors of an earlier one.
+        """
+        groups = []
+        spares = []
+        words = []
+
+        for _ in range(attempts):
+            if len(groups) == 4:
+                return np.array([row for group in groups for row in group])
+
+            if spares and self.rng.random() < herring:
+                near = spares[self.rng.integers(len(spares))]
+                seed = near[self.rng.integers(len(near))] if near else self.rng.choice(self.seeds)
+            else:
+                seed = self.rng.choice(self.seeds)
+
+            if not self.fits(seed, words):
+                continue
+
+            found = self.group(int(seed), words)
+
+            if found is not None:
+                groups.append(found[0])
+                spares.append(found[1])
+                words += [self.words[row] for row in found[0]]
+
+        return np.array([row for group in groups for row in group]) if len(groups) == 4 else None
+
+    def score(self, rows):
+        """
+        Return the adjacency of a board and its difficulty: how many wrong groups the solver scores
+        above the weakest answer group, from their conductance and density.
+        """
+        vectors = self.vectors[rows].astype(np.float64)
+        adj = vectors @ vectors.T
+        scores = score(COMBOS, adj, self.weights)
+        weakest = scores[ANSWERS].min()
+
+        return adj, int((scores > weakest).sum() - (scores[ANSWERS] > weakest).sum())
+
+    def generate(self, count, least=0, most=None, herring=HERRING, attempts=None):
+        """
+        Generate 'count' boards whose difficulty lies between 'least' and 'most', giving up after
+        'attempts' proposals (by default 100 per board). Returns the words of the boards, their
+        adjacencies and difficulties.
+        """
+        words, adjs, difficulties = [], [], []
+
+        for _ in range(attempts or count * 100):
+            if len(words) == count:
+                break
+
+            rows = self.board(herring)
+
+            if rows is None:
+                continue
+
+            adj, difficulty = self.score(rows)
+
+            if difficulty >= least and (most is None or difficulty <= most):
+                words.append([self.words[row] for row in rows])
+                adjs.append(adj)
+                difficulties.append(difficulty)
+
+        return (
+            np.array(words).reshape(-1, 16),
+            np.array(adjs, dtype=np.float64).reshape(-1, 16, 16),
+            np.array(difficulties, dtype=np.int64),
+        )
+
+
+def write(name, words, adjs):
+    """
+    Write boards as the data.npy and word_data.npy of a data model named 'name'.
+    """
+    os.makedirs(name, exist_ok=True)
+    np.save(name + "/data.npy", adjs)
+    np.save(name + "/word_data.npy", words)
+
+
+if __name__ == "__main__":
+    name = sys.argv[1]
+    count = int(sys.argv[2]) if len(sys.argv) > 2 and sys.argv[2].isdigit() else 1000
+
+    generator = Generator(DATA_MODEL)
+    start = time.perf_counter()
+    if "--hard" in sys.argv:
+        words, adjs, difficulties = generator.generate(count, least=HARD)
+    else:
+        words, adjs, difficulties = generator.generate(count, most=EASY)
+
+    elapsed = time.perf_counter() - start
+
+    write(name, words, adjs)
+    print("%d boards in %.1fs (%.0f per minute), mean difficulty %.2f" % (
+        len(words), elapsed, len(words) * 60 / elapsed, difficulties.mean() if len(words) else 0.0
+    ))
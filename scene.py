@@ -5,10 +5,13 @@ Generates visual representation of the Connections AI
 import pygame
 import sys
 import time
+import queue
+import threading
+import functools
 import numpy as np
 import pygame_gui
-import copy
-from game_master import check, push, pop, genPq, linkPq, childPq, purge
+from game_master import check, pop, genPq, linkPq, childPq, Feedback, ScoreTable
+from game_store import GameStore
 
 
 pygame.init()
@@ -18,6 +21,11 @@ GRID_WIDTH, GRID_HEIGHT = 600, 600
 ROWS, COLS = 4, 4
 CELL_WIDTH, CELL_HEIGHT = GRID_WIDTH // COLS, GRID_HEIGHT // ROWS
 
+FPS = 60
+# Seconds between cells or queue lines appearing, and how long a result stays on screen.
+REVEAL = 0.02
+MESSAGE = 1.0
+
 MANAGER = pygame_gui.UIManager((WIDTH, HEIGHT))
 CLOCK = pygame.time.Clock()
 
@@ -40,6 +48,9 @@ font = pygame.font.SysFont("sitkabanner", 22)
 grid_x = (WIDTH - GRID_WIDTH) // 5
 grid_y = (HEIGHT - GRID_HEIGHT) // 2
 
+queue_x, queue_y = 850, 70
+LINE_HEIGHT = 35
+
 
 def truncate(value):
     """
@@ -48,30 +59,24 @@ def truncate(value):
     return f"{value:.3f}"
 
 
-def draw_grid(words, avail):
+@functools.lru_cache(maxsize=1024)
+def render(text):
     """
-    Draw a grid of words on the screen, using available indices from 'avail'.
+    Render a line of text once, so every frame that shows it reuses the surface.
     """
-    words = [words[idx] for idx in avail if 0 <= idx < len(words)]
-    np.random.shuffle(words)
-
-    ROW = int(len(words) / 4)
-    COL = 4
+    return font.render(text, True, WHITE)
 
-    for row in range(ROW):
-        for col in range(COL):
 
-            x = grid_x + col * CELL_WIDTH
-            y = grid_y + row * CELL_HEIGHT
-            pygame.draw.rect(screen, WHITE, (x, y, CELL_WIDTH, CELL_HEIGHT), 1)
-            word = words[row * COL + col]
-            text = font.render(word, True, WHITE)
-            text_rect = text.get_rect(
-                center=(x + CELL_WIDTH // 2, y + CELL_HEIGHT // 2)
-            )
-            screen.blit(text, text_rect)
-            pygame.display.update()
-            time.sleep(0.02)
+@functools.lru_cache(maxsize=None)
+def render_cell(word):
+    """
+    Render a grid cell, its border and its word, once.
+    """
+    cell = pygame.Surface((CELL_WIDTH, CELL_HEIGHT))
+    pygame.draw.rect(cell, WHITE, cell.get_rect(), 1)
+    text = render(word)
+    cell.blit(text, text.get_rect(center=(CELL_WIDTH // 2, CELL_HEIGHT // 2)))
+    return cell
 
 
 def remove_indices(words, indices):
@@ -92,48 +97,30 @@ def convertIndex(index, arr):
     return arr
 
 
-def draw_pq(index, queue):
+def queue_lines(index, pq):
     """
-    Draw the priority queue on the screen with the parsed results.
+    Format the top 20 of the priority queue as the lines to draw.
     """
-    i = 0
-    y_offset = 70
-
-    while len(queue) > 0:
-
-        if i >= 20:
-            break
-
-        out = pop(queue)
-        text = font.render(
-            f"{i+1}: {parse_result(convertIndex(index, list(out[0])))} - {truncate(out[1])}",
-            True,
-            "WHITE",
-        )
-        screen.blit(text, (850, y_offset))
-
-        y_offset += 35
-
-        i += 1
-
-        pygame.display.update()
-        time.sleep(0.02)
+    return [
+        f"{i+1}: {parse_result(convertIndex(index, list(out[0])))} - {truncate(out[1])}"
+        for i, out in enumerate(pq.top(20))
+    ]
 
 
 def display_result(out, curr, index):
     """
-    Display the result of the user's selection (correct, incorrect, or one away).
+    Describe the result of the user's selection (correct, incorrect, or one away).
     """
     curr = parse_result(convertIndex(index, curr))
 
     if out == -1:
-        show_text(str(curr) + " is incorrect.")
+        return str(curr) + " is incorrect."
 
     elif out == 0:
-        show_text(str(curr) + " is one away.")
+        return str(curr) + " is one away."
 
     else:
-        show_text(str(curr) + " is correct!")
+        return str(curr) + " is correct!"
 
 
 def parse_result(result):
@@ -150,164 +137,238 @@ def parse_result(result):
     return s[:-2]
 
 
-def show_text(word):
-    """
-    Display a single line of text in the center of the screen and wait.
-    """
-    word = str(word)
-
-    while True:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-
-        screen.fill(BLACK)
-
-        text = font.render(word, True, WHITE)
-        text_rect = text.get_rect(center=(WIDTH // 2, HEIGHT // 2))
-        screen.blit(text, text_rect)
-        pygame.display.update()
-
-        time.sleep(1)
-
-        screen.fill(BLACK)
-
-        return
-
-
 def pop_specific(pq, n):
     """
     Pop the 'n'th element from the priority queue.
     """
-    temp = []
-
-    for i in range(n - 1):
-        out = pop(pq)
-        push(temp, out[0], out[1])
-
-    out = pop(pq)
-
-    while len(temp) > 0:
-        popped = pop(temp)
-        push(pq, popped[0], popped[1])
-
-    pq += temp
+    return (pq.remove(n), pq)
 
-    return (out, pq)
 
-
-def user_pop(words, pq, avail):
+class Solver(threading.Thread):
     """
-    Allow the user to pop an element from the priority queue based on input.
+    Plays the nth game of "data_name" on a background thread. Everything to show is streamed to the
+    UI as events, and each pick is read from the choices the UI sends back, so building queues
+    never holds up drawing.
     """
-    shuffled = copy.deepcopy(words)
 
-    screen.fill(BLACK)
-    draw_grid(shuffled, avail)
-    draw_pq(words, pq[:])
+    def __init__(self, n, data_name, weights):
+        super().__init__(daemon=True)
+        self.n = n
+        self.data_name = data_name
+        self.weights = weights
+        self.events = queue.Queue()
+        self.choices = queue.Queue()
+        self.feedback = Feedback()
+
+    def user_pop(self, words, pq, avail):
+        """
+        Show the board and queue, then wait for the user to pick an element of the queue by rank.
+        """
+        self.events.put(("board", [words[idx] for idx in avail if 0 <= idx < len(words)]))
+        self.events.put(("queue", queue_lines(words, pq)))
+
+        while True:
+            choice = self.choices.get()
+
+            if 0 < choice <= len(pq.top(20)):
+                temp = pop_specific(pq, choice)
+                return temp[0][0], temp[1]
+
+    def guess(self, words, pq, avail):
+        """
+        Let the user pick a guess, check it and report the result.
+        """
+        curr, pq = self.user_pop(words, pq, avail)
+        out = check(curr)
+        self.feedback.add(curr, out)
+        self.events.put(("message", display_result(out, curr[:], words)))
+        return curr, pq, out
+
+    def run(self):
+        weights = self.weights
+        store = GameStore.open(self.data_name)
+        words = store.words[self.n].tolist()
+        table = ScoreTable(store[self.n], sizes=(3,))
+        avail = table.available()
+
+        turns = 0
+
+        while table.avail != 0:
 
-    while True:
+            out = -1
+            curr = []
+            pq = genPq(table, weights, self.feedback)
 
-        UI_REFRESH_RATE = CLOCK.tick(60) / 1000
+            while out == -1:
 
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
+                curr, pq, out = self.guess(words, pq, avail)
+                turns += 1
 
-            if (
-                event.type == pygame_gui.UI_TEXT_ENTRY_FINISHED
-                and event.ui_object_id == "#main_text_entry"
-            ):
+            if out == 0:
 
-                input = event.text
+                trios = linkPq(curr, table, weights)
 
-                if int(input) <= min(len(pq), 20) and int(input) > 0:
-                    temp = pop_specific(pq, int(input))
-                    return temp[0][0], temp[1]
+                while out != 1:
 
-            MANAGER.process_events(event)
+                    bestTrio = pop(trios)[0]
+                    pq = childPq(bestTrio, table, weights, self.feedback)
+                    out = 0
 
-        MANAGER.update(UI_REFRESH_RATE)
+                    while out == 0 and len(pq.top(1)) > 0:
 
-        MANAGER.draw_ui(screen)
+                        curr, pq, out = self.guess(words, pq, avail)
+                        turns += 1
 
-        pygame.display.update()
+            table.solve(curr)
+            avail = table.available()
 
+        self.events.put(("done", turns))
 
 
-def play(n, data_name, weights):
+class Scene:
     """
-    The main game loop, playing the nth connection game in "data_name" folder with the provided weights.
+    Draws the solver's events at a steady frame rate. Only what changed each frame is blitted and
+    pushed to the display: cells and queue lines appear one per REVEAL seconds, results stay up for
+    MESSAGE seconds, and both are timed off the clock rather than by sleeping.
     """
-    word_archive = np.load(data_name + "/word_data.npy")
-    words = word_archive[n]
-    adj = np.load(data_name + "/" + "data.npy", allow_pickle=True)[n]
-    avail = range(16)
-    pq = genPq(adj, avail, weights)
 
-    turns = 0
+    def __init__(self, solver):
+        self.solver = solver
+        self.cells = []
+        self.lines = []
+        self.shown_cells = 0
+        self.shown_lines = 0
+        self.revealed = 0.0
+        self.message_until = None
+        self.turns = None
+        self.dirty = []
+
+    def clear(self):
+        """
+        Blank the whole screen.
+        """
+        screen.fill(BLACK)
+        self.dirty.append(screen.get_rect())
+
+    def handle(self, event, now):
+        """
+        Apply one event from the solver.
+        """
+        kind, value = event
+
+        if kind == "board":
+            words = list(value)
+            np.random.shuffle(words)
+            self.clear()
+            self.cells = [
+                (render_cell(word), (grid_x + (i % COLS) * CELL_WIDTH, grid_y + (i // COLS) * CELL_HEIGHT))
+                for i, word in enumerate(words)
+            ]
+            self.lines = []
+            self.shown_cells = self.shown_lines = 0
+            self.revealed = now
+
+        elif kind == "queue":
+            self.lines = [
+                (render(line), (queue_x, queue_y + i * LINE_HEIGHT)) for i, line in enumerate(value)
+            ]
 
-    while len(avail) != 0:
+        else:
+            if kind == "done":
+                self.turns = value
+                value = "Amount of Mistakes: " + str(value - 4)
 
-        out = -1
-        curr = []
-        pq = genPq(adj, avail, weights)
+            self.clear()
+            self.cells = self.lines = []
+            text = render(value)
+            screen.blit(text, text.get_rect(center=(WIDTH // 2, HEIGHT // 2)))
+            self.message_until = now + MESSAGE
 
-        while out == -1:
+    def reveal(self, now):
+        """
+        Blit the cells, then the queue lines, that are due by now and not drawn yet.
+        """
+        due = int((now - self.revealed) / REVEAL) + 1
+        cells = min(due, len(self.cells))
+        lines = min(max(due - len(self.cells), 0), len(self.lines))
 
-            temp = user_pop(words, pq[:], avail)
+        for surface, pos in self.cells[self.shown_cells:cells]:
+            self.dirty.append(screen.blit(surface, pos))
 
-            curr = temp[0]
-            pq = temp[1]
-            out = check(curr)
+        for surface, pos in self.lines[self.shown_lines:lines]:
+            self.dirty.append(screen.blit(surface, pos))
 
-            display_result(out, curr[:], words)
+        self.shown_cells, self.shown_lines = cells, lines
 
-            turns += 1
+    def frame(self, now, time_delta):
+        """
+        Advance the scene by one frame, returning False once the game is over.
+        """
+        if self.message_until is not None:
+            if now < self.message_until:
+                return True
 
-        if out == 0:
+            self.message_until = None
+            self.clear()
 
-            trios = linkPq(curr, adj, weights)
-            out = -1
+            if self.turns is not None:
+                return False
 
-            while out != 1:
+        while self.message_until is None:
+            try:
+                self.handle(self.solver.events.get_nowait(), now)
+            except queue.Empty:
+                break
 
-                bestTrio = pop(trios)[0]
-                pq = childPq(bestTrio, adj, avail, weights)
+        if self.message_until is None:
+            self.reveal(now)
+            MANAGER.update(time_delta)
+            MANAGER.draw_ui(screen)
+            self.dirty.append(TEXT_INPUT.rect)
 
-                temp = user_pop(words, pq[:], avail)
-                curr = temp[0]
-                pq = temp[1]
-                out = check(curr)
+        return True
 
-                display_result(out, curr[:], words)
+    def run(self):
+        """
+        The UI loop: handle input, draw the frame and update only the dirty parts of the display.
+        """
+        self.clear()
 
-                turns += 1
+        while True:
+            time_delta = CLOCK.tick(FPS) / 1000
 
-                while out == 0:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    pygame.quit()
+                    sys.exit()
 
-                    temp = user_pop(words, pq[:], avail)
-                    curr = temp[0]
-                    pq = temp[1]
-                    out = check(curr)
+                if (
+                    event.type == pygame_gui.UI_TEXT_ENTRY_FINISHED
+                    and event.ui_object_id == "#main_text_entry"
+                    and event.text.strip().isdigit()
+                ):
+                    self.solver.choices.put(int(event.text))
 
-                    display_result(out, curr[:], words)
+                MANAGER.process_events(event)
 
-                    turns += 1
+            running = self.frame(time.perf_counter(), time_delta)
 
-            else:
-                adj = purge(adj, curr)
-                avail = list(set(avail) - set(curr))
+            pygame.display.update(self.dirty)
+            self.dirty = []
 
-        else:
-            adj = purge(adj, curr)
-            avail = list(set(avail) - set(curr))
+            if not running:
+                return self.turns
 
-    show_text("Amount of Mistakes: " + str(turns - 4))
-    return turns
+
+def play(n, data_name, weights):
+    """
+    The main game loop, playing the nth connection game in "data_name" folder with the provided weights.
+    """
+    solver = Solver(n, data_name, weights)
+    solver.start()
+    return Scene(solver).run()
 
 WEIGHTS = (0.7441864013671875, 0.06005859375)
 
-play(1, "fasttext", WEIGHTS)
+if __name__ == "__main__":
+    play(1, "fasttext", WEIGHTS)
@@ -0,0 +1,347 @@
+"""
+Runs the solver as a local HTTP service: POST /solve with {"words": [16 words]} returns the best ranked
+candidate groups and the sequence of groups the AI would guess; GET /metrics returns latency and
+throughput. The embedding table stays resident, concurrent requests are coalesced into batches scored
+together off the event loop, and repeated boards are answered from a cache.
+Also includes a load generator to measure the service under a steady request rate.
+"""
+
+import asyncio
+import collections
+import json
+import sys
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from embedding_store import EmbeddingStore
+from game_master import WEIGHTS, combinations, solveAll, warmup
+
+DATA_MODEL = "fasttext"
+HOST, PORT = "127.0.0.1", 8750
+WINDOW = 0.002
+BATCH = 64
+CACHE = 4096
+TOP = 10
+REASONS = {200: b"OK", 400: b"Bad Request", 404: b"Not Found", 422: b"Unprocessable Entity", 500: b"Internal Server Error"}
+# Every group of a board, in the order solveAll scores them.
+COMBOS = combinations(range(16), 4).tolist()
+
+
+def answer(result, words):
+    """
+    Put the groups of a result, given as positions on the board, into the words of a request.
+    """
+    return {
+        "groups": [{"words": [words[j] for j in group], "score": score} for group, score in result["groups"]],
+        "guesses": [[words[j] for j in group] for group in result["guesses"]],
+    }
+
+
+class Metrics:
+    """
+    Counts of requests, cache hits and batches, with the latencies of the most recent requests.
+    """
+
+    def __init__(self, keep=100000):
+        self.started = time.perf_counter()
+        self.latencies = collections.deque(maxlen=keep)
+        self.requests = 0
+        self.hits = 0
+        self.batches = 0
+        self.batched = 0
+
+    def record(self, seconds):
+        self.requests += 1
+        self.latencies.append((time.perf_counter(), seconds))
+
+    def snapshot(self, recent=10.0):
+        """
+        Return the counts, the mean batch size, and the throughput and latency percentiles of the last 'recent' seconds.
+        """
+        now = time.perf_counter()
+        window = [seconds for at, seconds in self.latencies if at >= now - recent]
+        percentiles = np.percentile(window, [50, 90, 99]) * 1000 if window else [0.0, 0.0, 0.0]
+
+        return {
+            "requests": self.requests,
+            "cache hits": self.hits,
+            "batches": self.batches,
+            "mean batch": self.batched / self.batches if self.batches else 0.0,
+            "uptime seconds": now - self.started,
+            "requests per second": len(window) / min(recent, now - self.started),
+            "p50 ms": float(percentiles[0]),
+            "p90 ms": float(percentiles[1]),
+            "p99 ms": float(percentiles[2]),
+        }
+
+
+class Service:
+    """
+    The solver service of one data model. Requests wait up to WINDOW seconds, or until BATCH of them
+    are pending, and are then scored together on a worker thread.
+    """
+
+    def __init__(self, word_data=DATA_MODEL, weights=WEIGHTS):
+        self.store = EmbeddingStore.open(word_data)
+        self.weights = tuple(weights)
+        self.executor = ThreadPoolExecutor(1)
+        self.cache = collections.OrderedDict()
+        self.inflight = {}
+        self.pending = []
+        self.timer = None
+        self.metrics = Metrics()
+
+        warmup()
+        solveAll(np.eye(16, dtype=np.float32)[None, None], self.weights)
+
+    async def solve(self, words, top=TOP):
+        """
+        Solve a board, sharing the work with identical requests already in flight. Boards are
+        matched whatever their case, so results are kept as positions on the board and only put
+        into words, the words of this request, on the way out.
+        """
+        key = (tuple(word.lower() for word in words), top)
+
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.metrics.hits += 1
+            return answer(self.cache[key], words)
+
+        if key not in self.inflight:
+            self.inflight[key] = asyncio.get_running_loop().create_future()
+            self.pending.append((key, words, top))
+
+            if len(self.pending) >= BATCH:
+                self.flush()
+            elif self.timer is None:
+                self.timer = asyncio.get_running_loop().call_later(WINDOW, self.flush)
+
+        return answer(await asyncio.shield(self.inflight[key]), words)
+
+    def flush(self):
+        """
+        Send the pending requests off as one batch.
+        """
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+        batch, self.pending = self.pending, []
+
+        if batch:
+            asyncio.ensure_future(self.run(batch))
+
+    async def run(self, batch):
+        """
+        Score a batch on the worker thread and hand every request its result. If scoring fails,
+        every request of the batch is failed with the error.
+        """
+        self.metrics.batches += 1
+        self.metrics.batched += len(batch)
+
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(self.executor, self.compute, batch)
+        except Exception as error:
+            results = [error] * len(batch)
+
+        for (key, words, top), result in zip(batch, results):
+            future = self.inflight.pop(key)
+
+            if isinstance(result, Exception):
+                future.set_exception(result)
+                continue
+
+            self.cache[key] = result
+            if len(self.cache) > CACHE:
+                self.cache.popitem(last=False)
+            future.set_result(result)
+
+    def compute(self, batch):
+        """
+        Build the adjacency of every board of a batch with one batched product, then solve and rank
+        them all together (see solveAll). Groups are given as positions on the board.
+        """
+        results = [None] * len(batch)
+        vectors = []
+        boards = []
+
+        for i, (key, words, top) in enumerate(batch):
+            try:
+                vectors.append(self.store.lookup(words))
+                boards.append(i)
+            except KeyError as error:
+                results[i] = error
+
+        if boards:
+            vectors = np.stack(vectors)
+            guesses, scores = solveAll(np.matmul(vectors, vectors.transpose(0, 2, 1))[None], self.weights)
+            order = np.argsort(-scores, axis=1, kind="stable")
+
+            for b, i in enumerate(boards):
+                key, words, top = batch[i]
+                results[i] = {
+                    "groups": [(COMBOS[c], float(scores[b, c])) for c in order[b, :top].tolist()],
+                    "guesses": guesses[b].tolist(),
+                }
+
+        return results
+
+    async def route(self, method, path, body):
+        """
+        Answer one HTTP request, returning its status and JSON payload.
+        """
+        if method == "GET" and path == "/metrics":
+            return 200, self.metrics.snapshot()
+
+        if method != "POST" or path != "/solve":
+            return 404, {"error": "unknown route " + path}
+
+        try:
+            request = json.loads(body)
+            words = request["words"]
+            top = int(request.get("top", TOP))
+        except (ValueError, KeyError, TypeError):
+            return 400, {"error": "expected a JSON object with 'words'"}
+
+        if len(words) != 16 or not all(isinstance(word, str) for word in words):
+            return 400, {"error": "expected 16 words"}
+
+        try:
+            return 200, await self.solve(words, top)
+        except KeyError as error:
+            return 422, {"error": error.args[0]}
+        except Exception as error:
+            return 500, {"error": repr(error)}
+
+    async def handle(self, reader, writer):
+        """
+        Serve the HTTP/1.1 requests of one connection, keeping it open until the client closes it.
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                start = time.perf_counter()
+                method, path, _ = line.decode("latin1").split(" ", 2)
+                headers = {}
+
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header.decode("latin1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                status, payload = await self.route(method, path, body)
+                data = json.dumps(payload).encode("utf8")
+
+                writer.write(
+                    b"HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n%s"
+                    % (status, REASONS[status], len(data), data)
+                )
+                await writer.drain()
+
+                if path == "/solve":
+                    self.metrics.record(time.perf_counter() - start)
+
+                if headers.get("connection", "").lower() == "close":
+                    break
+
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+            pass
+
+        finally:
+            writer.close()
+
+
+async def serve(host=HOST, port=PORT, word_data=DATA_MODEL):
+    """
+    Run the service until cancelled.
+    """
+    service = Service(word_data)
+    server = await asyncio.start_server(service.handle, host, port)
+
+    async with server:
+        await server.serve_forever()
+
+
+async def request(reader, writer, method, path, payload=None):
+    """
+    Send one request over a kept-alive connection, returning the status and decoded payload.
+    """
+    body = json.dumps(payload).encode("utf8") if payload is not None else b""
+    writer.write(b"%s %s HTTP/1.1\r\nContent-Length: %d\r\n\r\n%s" % (method.encode(), path.encode(), len(body), body))
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length = 0
+
+    while True:
+        header = await reader.readline()
+        if header in (b"\r\n", b""):
+            break
+        name, _, value = header.decode("latin1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def load(boards, rate, duration, host=HOST, port=PORT, connections=64):
+    """
+    Post boards at a steady 'rate' per second for 'duration' seconds over a pool of connections.
+    Latency is measured from when each request was due, so a backed-up service is not flattered.
+    Returns the achieved throughput and latency percentiles, and the service's own metrics.
+    """
+    due = asyncio.Queue()
+    start = time.perf_counter() + 0.1
+    latencies = []
+    errors = collections.Counter()
+
+    for i in range(int(rate * duration)):
+        due.put_nowait((start + (i / rate), boards[i % len(boards)]))
+
+    async def client():
+        reader, writer = await asyncio.open_connection(host, port)
+
+        while not due.empty():
+            at, words = due.get_nowait()
+            await asyncio.sleep(max(0.0, at - time.perf_counter()))
+            status, _ = await request(reader, writer, "POST", "/solve", {"words": list(words)})
+            latencies.append(time.perf_counter() - at)
+            errors[status] += 1
+
+        writer.close()
+
+    await asyncio.gather(*[client() for _ in range(connections)])
+    elapsed = time.perf_counter() - start
+
+    reader, writer = await asyncio.open_connection(host, port)
+    _, metrics = await request(reader, writer, "GET", "/metrics")
+    writer.close()
+
+    percentiles = np.percentile(latencies, [50, 90, 99]) * 1000
+
+    return {
+        "requests": len(latencies),
+        "statuses": dict(errors),
+        "requests per second": len(latencies) / elapsed,
+        "p50 ms": float(percentiles[0]),
+        "p90 ms": float(percentiles[1]),
+        "p99 ms": float(percentiles[2]),
+    }, metrics
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["load"]:
+        rate = float(sys.argv[2]) if len(sys.argv) > 2 else 200
+        duration = float(sys.argv[3]) if len(sys.argv) > 3 else 10
+        boards = np.load(DATA_MODEL + "/word_data.npy").tolist()
+        for result in asyncio.run(load(boards, rate, duration)):
+            print(json.dumps(result, indent=1))
+
+    else:
+        asyncio.run(serve(port=int(sys.argv[2]) if len(sys.argv) > 2 else PORT))
@@ -0,0 +1,232 @@
+"""
+Optional instrumentation of game_master.play. While STATS holds a Stats, every game played records the
+subsets scored, heap pushes and pops, the time spent in each phase, Numba compile time and the guesses
+made from each kind of queue. When STATS is None, play binds the plain functions and records nothing.
+"""
+
+import json
+import os
+import time
+from numba.core import event
+
+STATS = None
+
+PHASES = ("genPq", "linkPq", "childPq", "purge")
+COUNTS = ("turns", "scored", "pushes", "pops")
+TIMES = ("seconds", "compile seconds") + tuple(phase + " seconds" for phase in PHASES)
+GUESSES = ("genPq guesses", "childPq guesses")
+
+
+class Compiles(event.Listener):
+    """
+    Adds the time of every outermost Numba compilation to the game being played.
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.depth = 0
+        self.begun = 0.0
+
+    def on_start(self, ev):
+        if self.depth == 0:
+            self.begun = time.perf_counter()
+        self.depth += 1
+
+    def on_end(self, ev):
+        self.depth -= 1
+        if self.depth == 0 and self.stats.current is not None:
+            self.stats.current["compile seconds"] += time.perf_counter() - self.begun
+
+
+class Stats:
+    """
+    Per-game records of the games played while enabled, with wrappers that play uses to record them.
+    """
+
+    def __init__(self):
+        self.games = []
+        self.current = None
+        self.queues = []
+        self.phases = {}
+        self.last = None
+        self.compiles = Compiles(self)
+
+    def start(self, game):
+        """
+        Begin the record of a game.
+        """
+        self.current = {"game": int(game), "pid": os.getpid(), "start": time.perf_counter(), "events": []}
+        self.current.update({name: 0 for name in COUNTS + GUESSES})
+        self.current.update({name: 0.0 for name in TIMES})
+
+    def timed(self, phase, fn, *args):
+        """
+        Call fn, adding its time to the phase and to the game's trace.
+        """
+        start = time.perf_counter()
+        out = fn(*args)
+        seconds = time.perf_counter() - start
+
+        self.current[phase + " seconds"] += seconds
+        self.current["events"].append((phase, start, seconds))
+
+        return out
+
+    def builder(self, phase, fn):
+        """
+        Wrap a queue builder so its queues are timed, counted and popped under its phase.
+        """
+        def build(*args):
+            pq = self.timed(phase, fn, *args)
+            self.queues.append((pq, len(pq)))
+            self.phases[id(pq)] = phase
+            return pq
+
+        return build
+
+    def popper(self, pop):
+        """
+        Wrap pop so popping from a queue made by a builder is timed under the builder's phase.
+        """
+        def take(pq):
+            self.last = self.phases[id(pq)]
+            return self.timed(self.last, pop, pq)
+
+        return take
+
+    def checker(self, check):
+        """
+        Wrap check so each guess is counted under the phase of the queue it was popped from.
+        """
+        def guess(lis):
+            self.current[self.last + " guesses"] += 1
+            return check(lis)
+
+        return guess
+
+    def timer(self, phase, fn):
+        """
+        Wrap fn so its calls are timed under the phase.
+        """
+        return lambda *args: self.timed(phase, fn, *args)
+
+    def finish(self, turns):
+        """
+        Close the record of the game, counting the work done by every queue it built.
+        """
+        record = self.current
+        record["turns"] = turns
+        record["seconds"] = time.perf_counter() - record["start"]
+
+        for pq, size in self.queues:
+            source = getattr(pq, "source", None)
+
+            if source is None:
+                record["scored"] += size
+                record["pushes"] += size
+                record["pops"] += size - len(pq)
+            else:
+                record["scored"] += source.scored
+                record["pushes"] += source.pushes
+                record["pops"] += source.pushes - len(source.pq)
+
+        self.games.append(record)
+        self.current = None
+        self.queues = []
+        self.phases = {}
+
+    def merge(self, records):
+        """
+        Add the records of games played elsewhere, like in a pool worker.
+        """
+        self.games.extend(records)
+
+    def summary(self, hardest=10):
+        """
+        Return a table of the totals and per-game means of every measure, and of the games that took the longest.
+        """
+        measures = COUNTS + GUESSES + TIMES
+        lines = [f"{'':<18}{'total':>14}{'mean':>14}{'max':>14}"]
+
+        for name in measures:
+            values = [record[name] for record in self.games]
+            total = sum(values)
+            lines.append(
+                f"{name:<18}{total:14.6g}{total / max(len(values), 1):14.6g}{max(values, default=0):14.6g}"
+            )
+
+        lines.append("")
+        lines.append(f"{'game':<8}" + "".join(f"{name.split()[0]:>10}" for name in ("turns",) + TIMES))
+
+        for record in sorted(self.games, key=lambda record: -record["seconds"])[:hardest]:
+            lines.append(
+                f"{record['game']:<8}{record['turns']:>10}" + "".join(f"{record[name]:10.4f}" for name in TIMES)
+            )
+
+        return "\n".join(lines)
+
+    def export(self, path):
+        """
+        Write the phases of every game as a Chrome trace (chrome://tracing, Perfetto): one track per game.
+        """
+        events = []
+
+        for record in self.games:
+            args = {name: record[name] for name in COUNTS + GUESSES + TIMES}
+            events.append({
+                "name": "game %d" % record["game"], "ph": "X", "pid": record["pid"], "tid": record["game"],
+                "ts": record["start"] * 1e6, "dur": record["seconds"] * 1e6, "args": args,
+            })
+
+            for phase, start, seconds in record["events"]:
+                events.append({
+                    "name": phase, "ph": "X", "pid": record["pid"], "tid": record["game"],
+                    "ts": start * 1e6, "dur": seconds * 1e6,
+                })
+
+        with open(path, "w") as file:
+            json.dump({"traceEvents": events}, file)
+
+
+def enable():
+    """
+    Start recording the games played in this process, returning the stats they are recorded in.
+    """
+    global STATS
+
+    if STATS is None:
+        STATS = Stats()
+        event.register("numba:compile", STATS.compiles)
+
+    return STATS
+
+
+def disable():
+    """
+    Stop recording, returning the stats recorded so far.
+    """
+    global STATS
+
+    stats, STATS = STATS, None
+
+    if stats is not None:
+        event.unregister("numba:compile", stats.compiles)
+
+    return stats
+
+
+def collect(fn, *args, **kwargs):
+    """
+    Call fn with its own recording enabled, returning its result and the records of the games it played.
+    Meant for pool workers, whose records their parent merges.
+    """
+    global STATS
+
+    previous, STATS = STATS, Stats()
+    event.register("numba:compile", STATS.compiles)
+
+    try:
+        return fn(*args, **kwargs), STATS.games
+    finally:
+        event.unregister("numba:compile", STATS.compiles)
+        STATS = previous
@@ -0,0 +1,98 @@
+"""
+Measures and reports cold start: the import time of each module in a fresh interpreter, the time
+to compile the solver kernels with an empty and with a warm Numba cache, and pool worker spin-up.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+MODULES = ["game_store", "embedding_store", "game_master", "feature_store", "generate_outcomes", "genetic_optimization"]
+
+spinup = {}
+
+
+def fresh(code, env=None):
+    """
+    Run code in a fresh interpreter, returning its wall time in seconds.
+    """
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], check=True, env=env)
+    return time.perf_counter() - start
+
+
+def import_times():
+    """
+    Time importing each module in a fresh interpreter, net of the interpreter's own startup.
+    """
+    base = fresh("pass")
+    return {module: fresh("import " + module) - base for module in MODULES}
+
+
+def compile_times():
+    """
+    Time warming up the kernels in a fresh interpreter, with an empty and then a populated cache.
+    """
+    with tempfile.TemporaryDirectory() as cache:
+        env = dict(os.environ, NUMBA_CACHE_DIR=cache)
+        code = "import game_master, time; t = time.perf_counter(); game_master.warmup(); print(time.perf_counter() - t)"
+        times = {}
+
+        for name in ("cold cache", "warm cache"):
+            out = subprocess.run([sys.executable, "-c", code], check=True, env=env, capture_output=True, text=True)
+            times[name] = float(out.stdout)
+
+        return times
+
+
+def timed_warmup():
+    """
+    Pool initializer that records how long the worker took to import and warm up the solver.
+    """
+    start = time.perf_counter()
+    from game_master import warmup
+
+    warmup()
+    spinup["seconds"] = time.perf_counter() - start
+
+
+def worker_time(_):
+    return os.getpid(), spinup["seconds"]
+
+
+def worker_spinup(workers=4):
+    """
+    Start a pool whose workers warm up in their initializer, returning each worker's spin-up
+    time and the wall time until every worker has answered.
+    """
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(workers, initializer=timed_warmup) as pool:
+        times = dict(pool.map(worker_time, range(workers * 4)))
+
+    return times, time.perf_counter() - start
+
+
+def report(workers=4):
+    """
+    Print every startup measurement.
+    """
+    for module, seconds in import_times().items():
+        print(f"import {module:<22}{seconds * 1000:8.0f} ms")
+
+    for name, seconds in compile_times().items():
+        print(f"warmup, {name:<21}{seconds * 1000:8.0f} ms")
+
+    times, wall = worker_spinup(workers)
+
+    for pid, seconds in times.items():
+        print(f"worker {pid:<22}{seconds * 1000:8.0f} ms")
+
+    print(f"pool of {workers} ready after{wall * 1000:12.0f} ms")
+
+
+if __name__ == "__main__":
+    report()
@@ -0,0 +1,149 @@
+"""
+Tests the batched, incremental dataset build of extract/extract.py against a tiny stand-in model.
+"""
+
+import importlib.util
+import json
+import os
+
+import numpy as np
+import pytest
+
+spec = importlib.util.spec_from_file_location(
+    "extract", os.path.join(os.path.dirname(__file__), "..", "extract", "extract.py")
+)
+extract = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(extract)
+
+GAMES = {
+    1: ["RED", "BLUE", "GREEN", "PINK", "CAT", "DOG", "COW", "PIG", "ONE", "TWO", "SIX", "TEN", "OAK", "ELM", "ASH", "FIR"],
+    2: ["SUN", "MOON", "STAR", "SKY", "HAT", "CAP", "FEZ", "TAM", "CAR", "BUS", "VAN", "CAB", "TEA", "GIN", "RUM", "ALE"],
+    3: ["ANT", "BEE", "FLY", "GNAT", "PEN", "INK", "NIB", "PAD", "HUT", "INN", "DEN", "PEW", "ZIG", "ZAG", "ZAP", "XYZZY"],
+}
+
+
+class FakeVectors:
+    """
+    A KeyedVectors stand-in: a random vector per known word, raising KeyError for unknown ones.
+    """
+
+    def __init__(self, words, unknown=()):
+        rng = np.random.default_rng(0)
+        self.vectors = {word.lower(): rng.normal(size=8).astype(np.float32) for word in words if word not in unknown}
+        self.lookups = 0
+
+    def __getitem__(self, word):
+        self.lookups += 1
+        return self.vectors[word]
+
+    def similarity(self, word1, word2):
+        a, b = self.vectors[word1], self.vectors[word2]
+        return float(a @ b / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+def write_puzzles(numbers, games=GAMES):
+    """
+    Write the given puzzles to extract/full_words.txt in the archive's format, newest first.
+    """
+    with open("extract/full_words.txt", "w", encoding="utf8") as file:
+        for number in sorted(numbers, reverse=True):
+            file.write("NYT Connections %d - August 6th, 2024\n" % number)
+            words = games[number]
+
+            for g in range(4):
+                file.write("GROUP %d - %s\n" % (g, ", ".join(words[4 * g:4 * g + 4])))
+
+
+def unused():
+    raise AssertionError("the model was loaded with nothing to compute")
+
+
+@pytest.fixture
+def model(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(extract, "MODEL_NAME", "fake")
+    os.makedirs("extract")
+    os.makedirs("fake")
+
+    return FakeVectors([word for words in GAMES.values() for word in words], unknown={"XYZZY"})
+
+
+def manifest():
+    with open("fake/manifest.json", encoding="utf8") as file:
+        return json.load(file)
+
+
+def test_similarities_match_pairwise(model):
+    games, matrices = extract.similarities([GAMES[1], GAMES[2]], model)
+
+    for words, matrix in zip(games, matrices):
+        for i, word1 in enumerate(words):
+            for j, word2 in enumerate(words):
+                assert matrix[i, j] == pytest.approx(model.similarity(word1.lower(), word2.lower()), abs=1e-6)
+
+
+def test_legacy_store_is_indexed_without_recomputing(model):
+    write_puzzles([1, 2])
+    extract.create(extract.extract("extract/full_words.txt"), model)
+    before = np.load("fake/data.npy")
+
+    assert extract.update("extract/full_words.txt", unused) == []
+    assert manifest()["games"] == {
+        "2": {"row": 0, "hash": extract.content_hash(GAMES[2])},
+        "1": {"row": 1, "hash": extract.content_hash(GAMES[1])},
+    }
+    assert np.array_equal(np.load("fake/data.npy"), before)
+
+
+def test_oov_puzzles_are_skipped_and_not_retried(model):
+    write_puzzles([1, 3])
+
+    assert extract.update("extract/full_words.txt", lambda: model) == [1]
+    assert manifest()["skipped"] == {"3": {"hash": extract.content_hash(GAMES[3]), "missing": ["XYZZY"]}}
+    assert list(manifest()["games"]) == ["1"]
+    assert np.load("fake/word_data.npy").tolist() == [GAMES[1]]
+
+    assert extract.update("extract/full_words.txt", unused) == []
+
+
+def test_puzzle_edited_out_of_vocabulary_is_removed(model):
+    write_puzzles([1, 2])
+    extract.update("extract/full_words.txt", lambda: model)
+    data = np.load("fake/data.npy")
+
+    write_puzzles([1, 2], {**GAMES, 2: GAMES[3]})
+    assert extract.update("extract/full_words.txt", lambda: model) == []
+    assert list(manifest()["skipped"]) == ["2"]
+    assert manifest()["games"] == {"1": {"row": 0, "hash": extract.content_hash(GAMES[1])}}
+    assert np.load("fake/word_data.npy").tolist() == [GAMES[1]]
+    assert np.array_equal(np.load("fake/data.npy"), data[1:])
+
+    write_puzzles([1, 2])
+    assert extract.update("extract/full_words.txt", lambda: model) == [2]
+    assert np.load("fake/word_data.npy").tolist() == [GAMES[1], GAMES[2]]
+    assert manifest()["games"]["2"]["row"] == 1
+
+
+def test_only_oov_puzzles_are_skipped(model):
+    write_puzzles([3])
+
+    assert extract.update("extract/full_words.txt", lambda: model) == []
+    assert list(manifest()["skipped"]) == ["3"]
+    assert np.load("fake/data.npy").shape == (0, 16, 16)
+
+
+def test_rerun_is_a_no_op(model):
+    write_puzzles([1])
+    extract.update("extract/full_words.txt", lambda: model)
+    first = np.load("fake/data.npy")
+
+    write_puzzles([1, 2])
+    model.lookups = 0
+    assert extract.update("extract/full_words.txt", lambda: model) == [2]
+    assert model.lookups == len(set(GAMES[2]))
+    assert np.load("fake/word_data.npy").tolist() == [GAMES[1], GAMES[2]]
+    assert np.array_equal(np.load("fake/data.npy")[:1], first)
+
+    files = {name: open("fake/" + name, "rb").read() for name in os.listdir("fake")}
+    assert extract.update("extract/full_words.txt", unused) == []
+    assert {name: open("fake/" + name, "rb").read() for name in os.listdir("fake")} == files
@@ -0,0 +1,119 @@
+"""
+Checks that the solver's fast paths agree with play: the compiled kernel (playAll), the feature replay
+(evaluate) and the lazy candidate order, on a few archive games, random boards and a two-model ensemble.
+"""
+
+import numpy as np
+import pytest
+
+import feature_store
+import game_master
+from game_master import Candidates, GameStore, ScoreTable, toMask
+
+GAMES = (0, 42, 189, 377)
+RANDOM = 4
+WEIGHTS = [game_master.WEIGHTS, (0.3, 0.9), (1.0, 0.0)]
+
+
+def boards(count, seed):
+    """
+    Random symmetric boards with unit self-similarity.
+    """
+    rng = np.random.default_rng(seed)
+    adj = rng.uniform(-0.2, 1.0, size=(count, 16, 16)).astype(np.float32)
+    adj = (adj + adj.transpose(0, 2, 1)) / 2
+    adj[:, np.arange(16), np.arange(16)] = 1
+
+    return adj
+
+
+@pytest.fixture
+def store(monkeypatch):
+    """
+    A data model of a few archive games followed by random boards, opened in memory.
+    """
+    archive = GameStore.open("fasttext")
+    adj = np.concatenate([np.stack([archive[n] for n in GAMES]), boards(RANDOM, 0)])
+    words = np.array([["w%d" % i for i in range(16)]] * len(adj))
+    monkeypatch.setitem(GameStore._open, "test", GameStore("test", adj, words))
+    monkeypatch.setattr(feature_store, "load", lambda word_data: feature_store.build(GameStore.open(word_data)))
+
+    return "test"
+
+
+@pytest.fixture
+def ensemble(monkeypatch, store):
+    """
+    A two-model data model: the games of 'store', and the same games with their similarities perturbed.
+    """
+    adj = GameStore.open(store).adj
+    tensor = np.stack([adj, np.clip(adj + boards(len(adj), 1) * 0.3 - 0.15, -1, 1)])
+    monkeypatch.setitem(GameStore._open, "test+test", GameStore("test+test", tensor, GameStore.open(store).words))
+
+    return "test+test"
+
+
+def played(word_data, weights):
+    return [game_master.play(n, word_data, weights) for n in range(len(GameStore.open(word_data)))]
+
+
+@pytest.mark.parametrize("weights", WEIGHTS)
+def test_kernel_plays_like_play(store, weights):
+    assert game_master.playAll(range(len(GameStore.open(store))), store, weights).tolist() == played(store, weights)
+
+
+@pytest.mark.parametrize("weights", WEIGHTS)
+def test_replay_plays_like_play(store, weights):
+    assert game_master.evaluate([weights], range(len(GameStore.open(store))), store)[0].tolist() == played(store, weights)
+
+
+def test_ensemble_plays_like_play(ensemble):
+    weights = game_master.WEIGHTS + (0.4, 0.2)
+    games = range(len(GameStore.open(ensemble)))
+
+    assert game_master.playAll(games, ensemble, weights).tolist() == played(ensemble, weights)
+    assert game_master.evaluate([weights], games, ensemble)[0].tolist() == played(ensemble, weights)
+
+
+def ranked(adj, avail, weights, base=()):
+    """
+    Every 4-subset of 'avail' that contains 'base', fully sorted by descending score, ties broken by the lowest subset.
+    """
+    table = ScoreTable(adj, sizes=(4,))
+    table.reset(toMask(avail))
+    rows = table.subsets(4, containing=toMask(base))
+    scores = table.score(4, rows, weights)
+    order = sorted(range(len(rows)), key=lambda i: (-scores[i], table.combos[4][rows[i]].tolist()))
+
+    return [table.combos[4][rows[i]].tolist() for i in order], [float(scores[i]) for i in order]
+
+
+def popped(adj, avail, weights, base=()):
+    """
+    Pop every subset from Candidates, returning them and their scores in the order popped.
+    """
+    candidates = Candidates(adj, avail, weights, 4, base=base)
+    out = []
+
+    while (candidate := candidates.pop()) is not None:
+        out.append(candidate)
+
+    return [combo for combo, num in out], [num for combo, num in out]
+
+
+@pytest.mark.parametrize("weights", WEIGHTS)
+@pytest.mark.parametrize("avail, base", [(range(16), ()), ([0, 1, 2, 4, 5, 7, 8, 9, 11, 12, 14, 15], (1, 8))])
+def test_candidates_pop_in_sorted_order(weights, avail, base):
+    for adj in boards(RANDOM, 2):
+        combos, scores = ranked(adj, list(avail), weights, base)
+        lazy, lazy_scores = popped(adj, list(avail), weights, base)
+
+        assert lazy == combos
+        assert lazy_scores == pytest.approx(scores)
+
+
+def test_ensemble_candidates_pop_in_sorted_order():
+    adj = boards(2, 3)
+    weights = game_master.WEIGHTS + (0.4, 0.2)
+
+    assert popped(adj, list(range(16)), weights) == ranked(adj, list(range(16)), weights)
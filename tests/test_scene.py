@@ -0,0 +1,91 @@
+"""
+Checks that the scene, always picking the best group in its queue, guesses exactly as play does.
+"""
+
+import os
+import threading
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pytest
+
+pygame = pytest.importorskip("pygame")
+pytest.importorskip("pygame_gui")
+
+import game_master
+import scene
+
+
+def played(n, weights, monkeypatch):
+    """
+    Play a game with game_master.play, returning its guesses and turns.
+    """
+    guesses = []
+    check = game_master.check
+    monkeypatch.setattr(game_master, "check", lambda arr: guesses.append(sorted(arr)) or check(arr))
+
+    return guesses, game_master.play(n, "fasttext", weights)
+
+
+def picked(n, weights):
+    """
+    Play a game with the scene's solver, always picking rank 1, returning its guesses and turns.
+    """
+    solver = scene.Solver(n, "fasttext", weights)
+    guesses = []
+    solver.start()
+
+    while True:
+        kind, value = solver.events.get(timeout=60)
+
+        if kind == "queue":
+            solver.choices.put(1)
+        elif kind == "message":
+            guesses.append(value)
+        elif kind == "done":
+            return guesses, value - 4
+
+
+@pytest.mark.parametrize("weights", [game_master.WEIGHTS, scene.WEIGHTS])
+@pytest.mark.parametrize("n", [1, 3, 189])
+def test_scene_guesses_like_play(n, weights, monkeypatch):
+    words = game_master.GameStore.open("fasttext").words[n].tolist()
+    guesses, turns = played(n, weights, monkeypatch)
+    messages, scene_turns = picked(n, weights)
+
+    assert [message.split(" is ")[0] for message in messages] == [", ".join(words[i] for i in g) for g in guesses]
+    assert scene_turns == turns
+
+
+def test_scene_window_plays_like_play(monkeypatch):
+    """
+    Run the whole UI loop on a hidden window, typing 1 into the entry line every 50 ms.
+    """
+    words = game_master.GameStore.open("fasttext").words[1].tolist()
+    guesses, turns = played(1, game_master.WEIGHTS, monkeypatch)
+    messages, frames = [], []
+    handle, frame = scene.Scene.handle, scene.Scene.frame
+    monkeypatch.setattr(scene, "MESSAGE", 0.05)
+    monkeypatch.setattr(scene.Scene, "handle", lambda self, event, now: messages.append(event) or handle(self, event, now))
+    monkeypatch.setattr(scene.Scene, "frame", lambda self, now, delta: frames.append(now) or frame(self, now, delta))
+    done = threading.Event()
+
+    def user():
+        while not done.wait(0.05):
+            pygame.event.post(pygame.event.Event(
+                scene.pygame_gui.UI_TEXT_ENTRY_FINISHED, {"text": "1", "ui_object_id": "#main_text_entry"}
+            ))
+
+    threading.Thread(target=user, daemon=True).start()
+
+    try:
+        scene_turns = scene.play(1, "fasttext", game_master.WEIGHTS)
+    finally:
+        done.set()
+
+    shown = [value.split(" is ")[0] for kind, value in messages if kind == "message"]
+    assert shown == [", ".join(words[i] for i in g) for g in guesses]
+    assert scene_turns - 4 == turns
+    # The loop keeps drawing while the solver works, never stalling the way a blocking sleep would.
+    assert max(b - a for a, b in zip(frames, frames[1:])) < 0.25
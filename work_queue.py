@@ -0,0 +1,296 @@
+"""
+Fans evaluation tasks, a population of weight vectors and a chunk of games, out to any number of
+workers over TCP or a Unix socket. Each worker keeps its data model's features resident and plays
+the tasks it is sent; the dispatcher retries tasks lost to failed workers, puts the results back
+together in game order and keeps throughput stats for every worker.
+"""
+
+import ipaddress
+import os
+import queue
+import secrets
+import socket
+import subprocess
+import sys
+import threading
+import time
+import traceback
+import numpy as np
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+# The environment variable holding the key workers and dispatchers authenticate each other with.
+# Messages are pickled, so anyone holding the key can run code on the other end.
+AUTHKEY = "CONNECTIONS_AUTHKEY"
+
+
+def environment_key():
+    """
+    Return the key set in the environment, or None when there is none.
+    """
+    key = os.environ.get(AUTHKEY)
+    return key.encode("utf8") if key else None
+
+
+def parse(address):
+    """
+    Parse "host:port" into a TCP address; anything else is the path of a Unix socket.
+    """
+    host, _, port = address.rpartition(":")
+
+    if host and port.isdigit():
+        return (host, int(port))
+
+    return address
+
+
+def unparse(address):
+    """
+    Format an address back into the form 'parse' reads.
+    """
+    if isinstance(address, tuple):
+        return "%s:%d" % address
+
+    return address
+
+
+def local(address):
+    """
+    Check whether an address can only be reached from this machine: a Unix socket or a loopback host.
+    """
+    if not isinstance(address, tuple):
+        return True
+
+    if address[0] == "localhost":
+        return True
+
+    try:
+        return ipaddress.ip_address(address[0]).is_loopback
+    except ValueError:
+        return False
+
+
+class Dispatcher:
+    """
+    Listens for workers on an address and hands out tasks to whichever worker is free.
+    Workers authenticate with 'authkey', the key in the environment by default. Without either,
+    a random key is generated, which 'spawn' passes on to local workers; listening on an address
+    other machines can reach is refused, as they could not know the key.
+    """
+
+    def __init__(self, address, authkey=None, retries=3, timeout=None):
+        if authkey is None:
+            authkey = environment_key()
+
+        if authkey is None:
+            if not local(address):
+                raise ValueError("set %s to listen on %s" % (AUTHKEY, unparse(address)))
+            authkey = secrets.token_hex(32).encode("utf8")
+
+        self.authkey = authkey
+        self.listener = Listener(address, authkey=authkey)
+        self.address = self.listener.address
+        self.retries = retries
+        self.timeout = timeout
+        self.tasks = queue.Queue()
+        self.stats = {}
+        self.joined = threading.Condition()
+        self.closed = False
+
+        threading.Thread(target=self.accept, daemon=True).start()
+
+    def accept(self):
+        """
+        Accept workers until the dispatcher is closed, driving each from its own thread.
+        """
+        while not self.closed:
+            try:
+                conn = self.listener.accept()
+            except AuthenticationError:
+                continue
+            except OSError:
+                return
+
+            threading.Thread(target=self.drive, args=(conn,), daemon=True).start()
+
+    def drive(self, conn):
+        """
+        Feed tasks to one worker until it fails or the dispatcher stops it.
+        """
+        try:
+            name = conn.recv()
+        except (EOFError, OSError):
+            return
+
+        with self.joined:
+            stats = self.stats.setdefault(name, {"tasks": 0, "evaluations": 0, "seconds": 0.0, "failures": 0})
+            stats["alive"] = True
+            self.joined.notify_all()
+
+        while True:
+            task = self.tasks.get()
+
+            if task is None:
+                conn.send(("stop",))
+                conn.close()
+                stats["alive"] = False
+                return
+
+            i, population, games, word_data, attempt, results = task
+            start = time.perf_counter()
+
+            try:
+                conn.send(("evaluate", i, population, games, word_data))
+                if self.timeout is not None and not conn.poll(self.timeout):
+                    raise TimeoutError("worker %s timed out" % name)
+                kind, _, value = conn.recv()
+
+            except (EOFError, OSError, TimeoutError) as error:
+                stats["failures"] += 1
+                stats["alive"] = False
+                conn.close()
+                self.retry(task, "%s: %r" % (name, error))
+                return
+
+            if kind == "error":
+                stats["failures"] += 1
+                self.retry(task, "%s: %s" % (name, value))
+                continue
+
+            stats["tasks"] += 1
+            stats["evaluations"] += len(population) * len(games)
+            stats["seconds"] += time.perf_counter() - start
+            results.put((i, value))
+
+    def retry(self, task, reason):
+        """
+        Put a failed task back on the queue, or report it as failed once it is out of retries.
+        """
+        i, population, games, word_data, attempt, results = task
+
+        if attempt >= self.retries:
+            results.put((i, RuntimeError("task %d failed %d times, last on %s" % (i, attempt + 1, reason))))
+        else:
+            self.tasks.put((i, population, games, word_data, attempt + 1, results))
+
+    def wait(self, count, timeout=None):
+        """
+        Block until at least 'count' workers are connected.
+        """
+        with self.joined:
+            if not self.joined.wait_for(lambda: len(self.workers()) >= count, timeout):
+                raise TimeoutError("only %d of %d workers joined" % (len(self.workers()), count))
+
+    def workers(self):
+        """
+        Return the names of the connected workers.
+        """
+        return [name for name, stats in self.stats.items() if stats["alive"]]
+
+    def evaluate(self, population, games, word_data, chunksize=None):
+        """
+        Play 'games' with every weight vector of 'population' across the workers, returning an
+        (n_weights, n_games) matrix of the number of turns taken.
+        """
+        games = np.asarray(games)
+
+        if chunksize is None:
+            chunksize = max(1, -(-len(games) // (max(len(self.workers()), 1) * 4)))
+
+        chunks = [games[i:i + chunksize] for i in range(0, len(games), chunksize)]
+        results = queue.Queue()
+
+        for i, chunk in enumerate(chunks):
+            self.tasks.put((i, [tuple(x) for x in population], chunk, word_data, 0, results))
+
+        turns = [None] * len(chunks)
+
+        for _ in chunks:
+            while True:
+                try:
+                    i, value = results.get(timeout=1)
+                    break
+                except queue.Empty:
+                    if not self.workers():
+                        raise RuntimeError("no workers left to play the queued tasks")
+
+            if isinstance(value, Exception):
+                raise value
+            turns[i] = value
+
+        return np.concatenate(turns, axis=1)
+
+    def report(self):
+        """
+        Return the stats of every worker, with its throughput in evaluations (games times weight vectors) per second.
+        """
+        return {
+            name: dict(stats, throughput=stats["evaluations"] / stats["seconds"] if stats["seconds"] else 0.0)
+            for name, stats in self.stats.items()
+        }
+
+    def close(self):
+        """
+        Stop every connected worker and stop listening.
+        """
+        self.closed = True
+
+        for _ in self.workers():
+            self.tasks.put(None)
+
+        self.listener.close()
+
+
+def serve(address, word_data="fasttext", authkey=None, name=None):
+    """
+    Run a worker: load the data model once, then play the tasks of the dispatcher at 'address' until it stops.
+    The worker authenticates with 'authkey', the key in the environment by default.
+    """
+    if authkey is None:
+        authkey = environment_key()
+
+    if authkey is None:
+        raise ValueError("set %s to the dispatcher's key" % AUTHKEY)
+
+    from feature_store import load
+    from game_master import evaluate, warmup
+
+    warmup()
+    load(word_data)
+
+    conn = Client(address, authkey=authkey)
+    conn.send(name or "%s:%d" % (socket.gethostname(), os.getpid()))
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+
+        if message[0] == "stop":
+            return
+
+        _, i, population, games, word_data = message
+
+        try:
+            conn.send(("done", i, evaluate(population, games, word_data)))
+        except Exception:
+            conn.send(("error", i, traceback.format_exc()))
+
+
+def spawn(dispatcher, count, word_data="fasttext"):
+    """
+    Start 'count' worker processes on this machine for a dispatcher, as a stand-in for workers on
+    other nodes. They are passed the dispatcher's key through their environment.
+    """
+    env = dict(os.environ, **{AUTHKEY: dispatcher.authkey.decode("utf8")})
+    script = os.path.abspath(__file__)
+
+    return [
+        subprocess.Popen([sys.executable, script, unparse(dispatcher.address), word_data], env=env)
+        for _ in range(count)
+    ]
+
+
+if __name__ == "__main__":
+    serve(parse(sys.argv[1]), *sys.argv[2:3])